@@ -0,0 +1,53 @@
+'''
+List of ints vs. BitVector for the key/challenge operations of a round:
+XOR of two keys and counting equal entries.
+
+    python benchmarks/bench_bitvec.py [max_exponent]
+'''
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from qzkp.bitvec import BitVector
+
+
+def best_of(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def list_round(x, y):
+    xored = tuple(i ^ j for i, j in zip(x, y))
+    equals = 0
+    for (i, j) in zip(xored, y):
+        equals += int(i == j)
+    return equals
+
+def bitvec_round(x, y):
+    return (x ^ y).matches(y)
+
+
+if __name__ == '__main__':
+
+    max_exponent = int(sys.argv[1]) if len(sys.argv) > 1 else 7
+    rng = np.random.default_rng(0)
+    print(f'{"bits":>10} {"list s":>10} {"bitvec s":>10} {"speedup":>8} {"list MB":>9} {"bitvec MB":>10}')
+    for exponent in range(3, max_exponent + 1):
+        n = 10 ** exponent
+        x_bits = rng.integers(0, 2, size=n, dtype=np.uint8)
+        y_bits = rng.integers(0, 2, size=n, dtype=np.uint8)
+        x_list, y_list = x_bits.tolist(), y_bits.tolist()
+        x_vec, y_vec = BitVector(x_bits), BitVector(y_bits)
+        assert list_round(x_list, y_list) == bitvec_round(x_vec, y_vec)
+
+        list_time = best_of(lambda: list_round(x_list, y_list), 1 if n >= 10**6 else 3)
+        bitvec_time = best_of(lambda: bitvec_round(x_vec, y_vec))
+        # A list stores one 8 byte pointer per bit (0 and 1 are shared int objects).
+        list_mb = sys.getsizeof(x_list) / 1e6
+        bitvec_mb = x_vec.words.nbytes / 1e6
+        print(f'{n:>10} {list_time:>10.4f} {bitvec_time:>10.6f} {list_time / bitvec_time:>8.0f} {list_mb:>9.2f} {bitvec_mb:>10.4f}')
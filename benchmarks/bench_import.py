@@ -0,0 +1,96 @@
+'''
+Startup cost of the heavy dependencies, the qzkp package, the scripts and
+single proof runs, each timed in a fresh interpreter. With --ref the same
+commands are also timed on the src tree of an earlier git revision.
+
+    python benchmarks/bench_import.py
+    python benchmarks/bench_import.py --ref HEAD~1 --output import.json
+'''
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+#----------------------------------------
+# Commands
+#----------------------------------------
+DEPENDENCIES = ['numpy', 'pandas', 'matplotlib.pyplot', 'seaborn', 'qiskit', 'qiskit_aer']
+MODULES = ['qzkp', 'qzkp.protocol', 'qzkp.batch', 'QZKP_barebones', 'QZKP_attack_ideal', 'QZKP_noise_flip', 'QZKP_noise_damping']
+# Single proofs of a 64 bit key, on the NumPy engine (no Qiskit) and on Aer.
+RUNS = {
+    'barebones numpy': ['QZKP_barebones.py', '64', '--backend', 'numpy', '--rng', 'numpy', '--seed', '0'],
+    'barebones aer': ['QZKP_barebones.py', '64', '--rng', 'numpy', '--seed', '0'],
+}
+
+def commands():
+    for module in DEPENDENCIES + MODULES:
+        yield f'import {module}', ['-c', f'import {module}']
+    for name, argv in RUNS.items():
+        yield name, argv
+
+
+#----------------------------------------
+# Timing
+#----------------------------------------
+def time_command(argv, cwd, repeat):
+    '''
+    Best and mean wall time of a fresh interpreter running argv, None when
+    it fails (e.g. a dependency or an option missing in that tree).
+    '''
+    env = dict(os.environ, PYTHONPATH=cwd)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        done = subprocess.run([sys.executable, *argv], cwd=cwd, env=env, capture_output=True)
+        times.append(time.perf_counter() - start)
+        if done.returncode != 0:
+            return None
+    return {'best': min(times), 'mean': sum(times) / len(times), 'repeat': repeat}
+
+def extract(ref, directory):
+    '''
+    src tree of a git revision, unpacked into directory.
+    '''
+    archive = subprocess.run(['git', 'archive', ref, 'src'], cwd=ROOT, capture_output=True, check=True).stdout
+    path = os.path.join(directory, 'archive.tar')
+    with open(path, 'wb') as f:
+        f.write(archive)
+    with tarfile.open(path) as tar:
+        if hasattr(tarfile, 'data_filter'):
+            tar.extractall(directory, filter='data')
+        else:
+            tar.extractall(directory)
+    return os.path.join(directory, 'src')
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Import and startup time benchmark.')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--ref', default=None, help='git revision to compare with')
+    parser.add_argument('--output', default=None, help='JSON file for the results')
+    args = parser.parse_args()
+
+    trees = {'current': os.path.join(ROOT, 'src')}
+    with tempfile.TemporaryDirectory() as directory:
+        if args.ref:
+            trees[args.ref] = extract(args.ref, directory)
+        results = []
+        print(f'{"command":<32}' + ''.join(f'{tree:>14}' for tree in trees))
+        for name, argv in commands():
+            row = {'command': name}
+            for tree, cwd in trees.items():
+                row[tree] = time_command(argv, cwd, args.repeat)
+            results.append(row)
+            cells = ''.join(f'{row[tree]["best"]:>13.3f}s' if row[tree] else f'{"failed":>14}' for tree in trees)
+            print(f'{name:<32}{cells}')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'python': sys.version, 'trees': list(trees), 'results': results}, f, indent=1)
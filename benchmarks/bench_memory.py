@@ -0,0 +1,70 @@
+'''
+Peak memory of one protocol round over the whole key at once vs. streamed
+in blocks of qzkp.streaming.CHUNK_BITS qubits, on the NumPy stabilizer
+engine. Every measurement runs in a fresh process, as the RSS high water
+mark never goes down.
+
+    python benchmarks/bench_memory.py [max_exponent] [--full-max EXPONENT]
+'''
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+
+def measure(bits, chunk):
+    '''
+    (seconds, tracemalloc peak MB, RSS growth MB) of one honest round.
+    '''
+    from qzkp.randomness import RandomSource
+    from qzkp.stabilizer import StabilizerBackend
+    from qzkp.streaming import KeyStream, stream_round
+
+    engine = StabilizerBackend(seed=0)
+    rand = RandomSource('numpy', seed=1)
+    keys = KeyStream(bits, 2, chunk)
+    # ru_maxrss is in KB on Linux, bytes on macOS.
+    scale = 1 if sys.platform == 'darwin' else 1024
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    tracemalloc.start()
+    start = time.perf_counter()
+    matches = stream_round(engine, keys, rand)
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale - baseline
+    assert matches == bits # Noiseless honest round
+    return seconds, peak / 1e6, rss / 1e6
+
+def measure_in_process(bits, chunk):
+    output = subprocess.run([sys.executable, __file__, '--child', str(bits), str(chunk)],
+                            capture_output=True, text=True, check=True).stdout
+    return tuple(float(value) for value in output.split())
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('max_exponent', type=int, nargs='?', default=8)
+    parser.add_argument('--full-max', type=int, default=6, help='largest exponent also run without streaming')
+    parser.add_argument('--child', type=int, nargs=2, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(*measure(*args.child))
+        sys.exit()
+
+    from qzkp.streaming import CHUNK_BITS
+
+    print(f'{"bits":>10} {"mode":>8} {"seconds":>9} {"traced MB":>10} {"RSS MB":>8}')
+    for exponent in range(4, args.max_exponent + 1, 2):
+        n = 10 ** exponent
+        modes = [('stream', CHUNK_BITS)] + ([('full', n)] if exponent <= args.full_max else [])
+        for mode, chunk in modes:
+            seconds, traced, rss = measure_in_process(n, chunk)
+            print(f'{n:>10} {mode:>8} {seconds:>9.3f} {traced:>10.2f} {rss:>8.2f}')
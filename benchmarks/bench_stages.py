@@ -0,0 +1,163 @@
+'''
+Times every protocol stage and full rounds for the ideal, flip and damping
+variants over key lengths and execution backends, and stores the results
+as JSON so runs of different versions can be compared.
+
+    python benchmarks/bench_stages.py --output bench.json
+    python benchmarks/bench_stages.py --sizes 16 256 --backends aer grouped --compare bench.json
+'''
+import argparse
+import importlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from qzkp.bitvec import BitVector
+from qzkp.protocol import c_aprox_gen, equal_entries_percentage
+from qzkp.sweep import DEFAULTS, SCRIPTS
+
+#----------------------------------------
+# Configurations
+#----------------------------------------
+NOISE = {
+    'ideal': {},
+    'flip': {'pbit': 0.01, 'pphase': 0.01},
+    'damping': {'gamma': 0.05, 'lam': 0.05},
+}
+# Config overrides of each execution backend, batch_size None means one job per stage.
+BACKENDS = {
+    'aer': {},
+    'batched': {'batch_size': None},
+    'grouped': {'grouped': True},
+    'cached': {'cache_size': 256},
+    'numpy': {'backend': 'numpy'},
+}
+RANDOMNESS = ['quantum', 'numpy', 'os']
+
+def supported(variant, backend):
+    # The stabilizer engine has no damping channel.
+    return not (backend == 'numpy' and variant == 'damping')
+
+
+#----------------------------------------
+# Timing
+#----------------------------------------
+def time_stage(fn, prepare=None, repeat=3):
+    '''
+    Best and mean wall time of fn(*prepare()), prepare not being timed.
+    '''
+    times = []
+    for _ in range(repeat):
+        args = prepare() if prepare is not None else ()
+        start = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - start)
+    return {'best': min(times), 'mean': sum(times) / len(times), 'repeat': repeat}
+
+def bench_point(variant, backend, key_length, repeat):
+    '''
+    Times of every stage of one variant/backend/key length.
+    '''
+    module = importlib.import_module(SCRIPTS[variant])
+    config = dict(DEFAULTS[variant], key_length=key_length, **NOISE[variant])
+    config.update({name: key_length if value is None else value for name, value in BACKENDS[backend].items()})
+    rng = np.random.default_rng(0)
+    a = BitVector(rng.integers(0, 2, size=key_length))
+    b = BitVector(rng.integers(0, 2, size=key_length))
+    c = BitVector(rng.integers(0, 2, size=key_length))
+    config.update({'a': a, 'b': b, 'rounds_seed': None})
+    module.setup(np.random.SeedSequence(0), argparse.Namespace(**config))
+    engine = module.engine
+
+    psi = lambda: (engine.psi_gen(a, b),)
+    challenge = lambda: (engine.challenge_gen(engine.psi_gen(a, b), c, b),)
+    results = engine.measurements(engine.challenge_gen(engine.psi_gen(a, b), c, b), a)
+    stages = {
+        'psi_gen': (lambda: engine.psi_gen(a, b), None),
+        'challenge_gen': (lambda psi: engine.challenge_gen(psi, c, b), psi),
+        'measurements': (lambda psi: engine.measurements(psi, a), challenge),
+        'c_aprox_gen': (lambda: c_aprox_gen(results, b, a), None),
+        'equal_entries_percentage': (lambda: equal_entries_percentage(c, b ^ BitVector(results)), None),
+        'round': (lambda: (getattr(module, 'protocol_round', None) or module.attack_round)(0), None),
+    }
+    # The ideal script has no honest prover, the noise scripts no zero knowledge step.
+    if hasattr(module, 'protocol_round'):
+        stages['alice_mod'] = (lambda psi: engine.alice_mod(psi, a, b), challenge)
+    else:
+        stages['zk_mod'] = (lambda psi: engine.zk_mod(psi, a ^ b), challenge)
+    return {stage: time_stage(fn, prepare, repeat) for stage, (fn, prepare) in stages.items()}
+
+def bench_randomness(key_length, repeat):
+    from qiskit_aer import AerSimulator
+    from qzkp.randomness import RandomSource
+
+    sim = AerSimulator()
+    return {mode: time_stage(lambda: RandomSource(mode, sim, 0).bits(key_length), None, repeat) for mode in RANDOMNESS}
+
+def environment():
+    versions = {'python': platform.python_version(), 'numpy': np.__version__}
+    for package in ('qiskit', 'qiskit_aer'):
+        try:
+            versions[package] = importlib.import_module(package).__version__
+        except ImportError:
+            versions[package] = None
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {'commit': commit, 'machine': platform.machine(), 'cpus': os.cpu_count(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'versions': versions}
+
+def compare(results, baseline):
+    '''
+    Prints the best time ratio (new / baseline) of every measurement present in both.
+    '''
+    old = {(r['variant'], r['backend'], r['stage'], r['key_length']): r['best'] for r in baseline['results']}
+    print(f'\n{"variant":<8} {"backend":<8} {"stage":<25} {"bits":>8} {"ratio":>7}')
+    for r in results:
+        key = (r['variant'], r['backend'], r['stage'], r['key_length'])
+        if key in old and old[key] > 0:
+            print(f'{key[0]:<8} {key[1]:<8} {key[2]:<25} {key[3]:>8} {r["best"] / old[key]:>7.2f}')
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Per stage benchmarks of the QZKP protocol.')
+    parser.add_argument('--variants', nargs='+', choices=list(SCRIPTS), default=list(SCRIPTS))
+    parser.add_argument('--backends', nargs='+', choices=list(BACKENDS), default=list(BACKENDS))
+    parser.add_argument('--sizes', nargs='+', type=int, default=[16, 256, 4096, 65536, 1048576])
+    parser.add_argument('--max-circuit-bits', type=int, default=4096, help='largest key length run with circuit backends')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default='bench.json')
+    parser.add_argument('--compare', default=None, help='earlier JSON output to compare with')
+    args = parser.parse_args()
+
+    results = []
+    for key_length in args.sizes:
+        if key_length <= args.max_circuit_bits:
+            for mode, timing in bench_randomness(key_length, args.repeat).items():
+                results.append({'variant': 'randomness', 'backend': mode, 'stage': 'bits', 'key_length': key_length, **timing})
+        for variant in args.variants:
+            for backend in args.backends:
+                if not supported(variant, backend):
+                    continue
+                if backend != 'numpy' and key_length > args.max_circuit_bits:
+                    continue
+                repeat = 1 if key_length >= 65536 else args.repeat
+                for stage, timing in bench_point(variant, backend, key_length, repeat).items():
+                    results.append({'variant': variant, 'backend': backend, 'stage': stage, 'key_length': key_length, **timing})
+                    print(f'{variant:<8} {backend:<8} {stage:<25} {key_length:>8} {timing["best"]:>10.5f}s')
+
+    with open(args.output, 'w') as f:
+        json.dump({'environment': environment(), 'results': results}, f, indent=1)
+    print(f'Results written to {args.output}')
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
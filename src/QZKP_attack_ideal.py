@@ -1,175 +1,145 @@
-from qiskit import QuantumCircuit
-from qiskit_aer import AerSimulator
-import random
-import matplotlib.pyplot as plt
-import numpy as np
-import pandas as pd
-import seaborn as sns
+import argparse
 import time
-import sys
+import numpy as np
+from qzkp.bitvec import BitVector
+from qzkp.parallel import iter_parallel
+from qzkp.profiling import Profiler
+from qzkp.protocol import CircuitProtocol, loading_bar, run_attack_round
+from qzkp.randomness import RandomSource
+from qzkp.seeding import reseed, round_seed
+from qzkp.results import EXTRA_COLUMNS, ResultWriter, result_columns, result_row
+from qzkp.stats import AccuracyStats
+from qzkp.stabilizer import StabilizerBackend
 
 
 #----------------------------------------
-# Auxiliary functions
+# Protocol round
 #----------------------------------------
-def quantum_random_binary_string(length):
-    '''
-    Random key generator using quantum randomness.
-    '''
-    string = []
-    for bit in range(length):
-        qcoin = QuantumCircuit(1,1)
-        qcoin.h(0)
-        qcoin.measure(0,0)
-        exec = sim.run(qcoin, shots=1).result()
-        string.append(int(list(exec.get_counts(qcoin).keys())[0]))
-    return string
-
-
-def psi_gen(a, b):
-    '''
-    Generation of the quantum state |psi>.
-    '''
-    if len(a) != len(b):
-        raise ValueError('Same number of b and bits expected.')
-    psi = []
-    for i in range(len(a)):
-        qubit = QuantumCircuit(1, 1)
-        if a[i] == 1:
-            qubit.x(0)
-        if b[i] == 1:
-            qubit.h(0)
-        psi.append(qubit)
-    return psi
-
-def challenge_gen(psi, c, b):
-    '''
-    Generation of the challenge for |psi>.
-    '''
-    if len(psi) != len(c):
-        raise ValueError('Same number of qubits and bits expected.')
-    for i in range(len(psi)):
-        if c[i] == 1:
-            if b[i]==0:
-                psi[i].x(0)
-            else:
-                psi[i].z(0)
-    return psi
-
-def zk_mod(psi, p):
-    '''
-    Alice Zero-Knowledge momdifications to the state |psi>.
-    '''
-    if len(psi) != len(p):
-        raise ValueError('Same number of qubits and bits expected.')
-    for i in range(len(psi)):
-        if p[i] == 1:
-            psi[i].h(0)
-    return psi
-
-def measurements(psi, b):
+def setup(seed_seq, settings):
     '''
-    Alice measures using the secret b.
+    Simulator, random source and backend used by attack_round, built in the
+    main process or once per worker of the parallel driver from the run
+    settings (an argparse.Namespace, see the config below). Qiskit is only
+    imported when the Aer backend or quantum randomness needs it.
     '''
-    if len(psi) != len(b):
-        raise ValueError('Same number of qubits and b expected.')
-    results = []
-    for i in range(len(psi)):
-        if b[i] == 1:
-            psi[i].h(0)
-        psi[i].measure(0, 0)
-        exec = sim.run(psi[i], shots=1).result()
-        result = int(list(exec.get_counts(psi[i]).keys())[0])
-        results.append(result)
-    return results
+    global config, engine, rand, cache, profiler
+    config = settings
+    rand_seed, engine_seed = seed_seq.spawn(2)
+    profiler = Profiler(config.profile, config.trace)
+    sim = None
+    if config.backend == 'aer' or config.rng == 'quantum':
+        from qiskit_aer import AerSimulator
 
-def c_aprox_gen(results, p, a):
-    '''
-    Generation of the approximation c' for c.
-    '''
-    c_aprox = []
-    for i, bit in enumerate(results):
-        # if bit == a[i] gamma[i]; else !gamma[i]
-        decission = int(p[i] ^ (bit != a[i]))
-        c_aprox.append(decission)
-    return c_aprox
+        sim = profiler.instrument(AerSimulator())
+    rand = RandomSource(config.rng, sim, rand_seed)
+    if config.backend == 'numpy':
+        engine = StabilizerBackend(seed=engine_seed)
+    else:
+        engine = CircuitProtocol(sim, config.cache_size, config.batch_size, config.grouped, config.wide, profiler=profiler)
+    cache = getattr(engine, 'cache', None)
 
-def equal_entries_percentage(list1, list2):
+def attack_round(iteration):
     '''
-    Percentage of equal entries.
+    One intercept-resend round by Eve, returns the percentage of matches.
     '''
-    if len(list1) != len(list2):
-        raise ValueError("The lists must have the same length.")
-    equals = 0
-    for (a, b) in zip(list1, list2):
-        equals += int(a == b)
-    return (equals / len(list1)) * 100
-
-def random_binary_string(length):
-    '''
-    Pseudo random binary strings.
-    '''
-    return [random.choice([0, 1]) for _ in range(length)]
-
-def loading_bar(iteration, total, start_time, prefix='Progress:', length=50, fill='█', print_end='\r'):
-    """
-    Progress bar.
-    """
-    percent = 100 * (iteration / total)
-    filled_length = int(length * iteration // total)
-    bar = fill * filled_length + '-' * (length - filled_length)
-    elapsed_time = time.time() - start_time
-    print(f'\r{prefix} |{bar}| {percent:.1f}% Elapsed: {elapsed_time:.1f}s', end=print_end)
-    if iteration == total:
-        print()
+    if config.rounds_seed is not None:
+        reseed(config.rounds_seed, iteration, rand, engine)
+    return run_attack_round(engine, rand, config.a, config.b, profiler)
 
 #----------------------------------------
 # Protocol execution
 #----------------------------------------
 if __name__=='__main__':
     
-    key_length = int(sys.argv[1])
-    num_iter = int(sys.argv[2])
-    sim = AerSimulator()
-    
-    percentages = []
+    parser = argparse.ArgumentParser(description='Intercept-resend attack on the ideal QZKP.')
+    parser.add_argument('key_length', type=int)
+    parser.add_argument('num_iter', type=int)
+    parser.add_argument('--batch-size', type=int, default=0, help='qubits per simulator job, 0 runs one job per qubit')
+    parser.add_argument('--grouped', action='store_true', help='run each distinct qubit circuit once with one shot per qubit sharing it')
+    parser.add_argument('--wide', action='store_true', help='pack each batch into one wide circuit, the whole measurement with --batch-size 0 (Clifford circuits only)')
+    parser.add_argument('--backend', choices=['aer', 'numpy'], default='aer', help='circuit simulation with Aer or the vectorized NumPy stabilizer engine')
+    parser.add_argument('--rng', choices=['quantum', 'numpy', 'os'], default='quantum', help='source of random keys, challenges and bases')
+    parser.add_argument('--seed', type=int, default=None, help='seed of every random stream (keys, rounds, simulator jobs, noise), reproducible with --rng numpy')
+    parser.add_argument('--cache', type=int, default=0, help='keep up to N distinct qubit circuits built and transpiled once, 0 disables')
+    parser.add_argument('--workers', type=int, default=1, help='processes running the rounds, 0 uses every core')
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv', help='results file format, parquet is written as a directory of chunks and needs pyarrow')
+    parser.add_argument('--flush-every', type=int, default=10000, help='rounds buffered in memory before being appended to the results')
+    # Attack rounds have no accept decision.
+    parser.add_argument('--columns', nargs='+', choices=[name for name in EXTRA_COLUMNS if name != 'accept'], default=[], help='extra per round columns: matches, time (seconds), seed (round seed, with --seed)')
+    parser.add_argument('--stop-precision', type=float, default=None, help='stop once the confidence interval of every mean accuracy is within ± this many percentage points')
+    parser.add_argument('--min-rounds', type=int, default=30, help='rounds of every class before an early stop is considered')
+    parser.add_argument('--stats-json', default=None, help='write the means, confidence intervals and histograms to this JSON file')
+    parser.add_argument('--profile', action='store_true', help='print wall time, calls and simulator jobs per protocol stage')
+    parser.add_argument('--profile-json', default=None, help='write the stage report and the stage times of every round to this JSON file')
+    parser.add_argument('--trace', default=None, help='write every stage as a Chrome trace (chrome://tracing, Perfetto) to this file')
+    args = parser.parse_args()
+    profile = args.profile or args.profile_json is not None or args.trace is not None
+    if profile and args.workers != 1:
+        parser.error('profiling runs in a single process, use --workers 1')
+
+    keys_seed, rounds_seed, workers_seed = np.random.SeedSequence(args.seed).spawn(3)
+    config = argparse.Namespace(
+        key_length=args.key_length,
+        batch_size=args.batch_size,
+        grouped=args.grouped,
+        wide=args.wide,
+        backend=args.backend,
+        rng=args.rng,
+        cache_size=args.cache,
+        profile=profile,
+        trace=args.trace is not None,
+        # Seeded Aer measurements run in fixed seed blocks instead of --batch-size jobs, so rounds are only reseeded when a seed is given.
+        rounds_seed=rounds_seed if args.seed is not None else None,
+    )
+    key_length, num_iter = args.key_length, args.num_iter
+    setup(keys_seed, config)
 
     start_time = time.time()
 
-    b = quantum_random_binary_string(key_length)
-    a = quantum_random_binary_string(key_length)
-
-    a_xor_b = tuple(i ^ j for i,j in zip(a,b))
-
-    iter=1
-    for i in range(num_iter):
-    
-        # 2. Preparation of the challenge (Bob)
-        psi = psi_gen(a, b) # |psi> state generation from a and b
-
-        c = tuple(quantum_random_binary_string(key_length)) # Random generation for c
-        challenge_state = challenge_gen(psi, c, b) # Challenge setup
-
-        # 3. Eve (which has access to a XOR b) meassures the challenge state randomly and generates the attakc estimation
-        r = random_binary_string(key_length)
-        measure_results = measurements(challenge_state, r)
-        attack_estimation = tuple(i ^ j for i,j in zip(a_xor_b, measure_results))
-        
-        # 4. Eve generates the attack state encoding the attack estimaiton with ranodm bassis
-        r = random_binary_string(key_length)
-        attack_state = psi_gen(attack_estimation, r)
-        
-        # 5. Eve sends the attack state to Bob and he measures and count matches
-        results = measurements(attack_state, a)
-        c_aprox = tuple(i ^j for i,j in zip(b, results))
-        equal_percentage = equal_entries_percentage(c, c_aprox)
-        percentages.append(equal_percentage)
-        loading_bar(iter, num_iter, start_time)
-        iter +=1
-
-    #----------------------------------------
-    # Data
-    #----------------------------------------
-    iters = range(1,num_iter + 1)
-    results = pd.DataFrame({'Iteration': iters, 'Percentages': percentages})
-    results.to_csv(f'iter_attack_data_{key_length}_{num_iter}.csv', index=False)
+    with profiler.stage('keys'):
+        b = BitVector(rand.bits(key_length))
+        a = BitVector(rand.bits(key_length))
+
+    config.a, config.b = a, b
+
+    progress = lambda done, total: loading_bar(done, total, start_time)
+    # Round seeds only exist for reseeded rounds, i.e. with --seed.
+    seed_of = lambda i: round_seed(config.rounds_seed, i) if config.rounds_seed is not None and 'seed' in args.columns else None
+    stats = AccuracyStats(precision=args.stop_precision, min_rounds=args.min_rounds)
+    output = f'iter_attack_data_{key_length}_{num_iter}.{args.format}'
+    with ResultWriter(output, result_columns(decision=False, extra=args.columns), args.format, args.flush_every) as writer:
+        if args.workers != 1:
+            for i, percentage, seconds in iter_parallel(attack_round, num_iter, args.workers, setup, (config,), workers_seed):
+                writer.write(result_row(i, percentage, key_length=key_length, seconds=seconds, extra=args.columns, seed=seed_of(i)))
+                progress(i + 1, num_iter)
+                stats.update(percentage)
+                if stats.should_stop():
+                    break
+        else:
+            for i in range(num_iter):
+                start = time.perf_counter()
+                with profiler.stage('round', i):
+                    percentage = attack_round(i)
+                seconds = time.perf_counter() - start
+                with profiler.stage('output'):
+                    writer.write(result_row(i, percentage, key_length=key_length, seconds=seconds, extra=args.columns, seed=seed_of(i)))
+                progress(i + 1, num_iter)
+                stats.update(percentage)
+                if stats.should_stop():
+                    break
+
+    if cache and args.workers == 1:
+        print(f'Circuit cache: {cache.stats()}')
+
+    if stats.stopped_at is not None:
+        print() # An early stop leaves the progress bar line open
+    print(stats.format_summary())
+    if args.stats_json:
+        stats.write_json(args.stats_json)
+
+    if args.profile:
+        print(profiler.format_report())
+    if args.profile_json:
+        profiler.write_json(args.profile_json)
+    if args.trace:
+        profiler.write_trace(args.trace)
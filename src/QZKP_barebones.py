@@ -1,125 +1,60 @@
-from qiskit import QuantumCircuit
-from qiskit_aer import AerSimulator
-import sys
-
-#----------------------------------------
-# Funcitons
-#----------------------------------------
-def quantum_random_binary_string(length):
-    '''
-    Random key generator using quantum randomness.
-    '''
-    string = []
-    for bit in range(length):
-        qcoin = QuantumCircuit(1,1)
-        qcoin.h(0)
-        qcoin.measure(0,0)
-        exec = sim.run(qcoin, shots=1).result()
-        string.append(int(list(exec.get_counts(qcoin).keys())[0]))
-    return string
-
-def psi_gen(a, b):
-    '''
-    Generation of the quantum state |psi>.
-    '''
-    if len(a) != len(b):
-        raise ValueError('Same number of basis and bits expected.')
-    psi = []
-    for i in range(len(a)):
-        qubit = QuantumCircuit(1, 1)
-        if a[i] == 1:
-            qubit.x(0)
-        if b[i] == 1:
-            qubit.h(0)
-        psi.append(qubit)
-    return psi
-
-def challenge_gen(psi, c, b):
-    '''
-    Generation of the challenge for |psi>.
-    '''
-    if len(psi) != len(c):
-        raise ValueError('Same number of qubits and bits expected.')
-    for i in range(len(psi)):
-        if c[i] == 1:
-            if b[i]==0:
-                psi[i].x(0)
-            else:
-                psi[i].z(0)
-    return psi
-
-def alice_mod(psi, a, b):
-    if len(psi) != len(a) or len(psi) != len(a):
-        raise ValueError('Same number of qubits and bits expected.')
-    a_xor_b = tuple(i ^ j for i,j in zip(a,b))
-    for i in range(len(psi)):
-        if b[i] == 1:
-            psi[i].z(0)
-        if a_xor_b[i] == 1:
-            psi[i].h(0)
-        if a[i] == 1:
-            psi[i].z(0)
-    return psi
-
-def measurements(psi, basis):
-    if len(psi) != len(basis):
-        raise ValueError('Same number of qubits and basis expected.')
-    results = []
-    for i in range(len(psi)):
-        if basis[i] == 1:
-            psi[i].h(0)
-        psi[i].measure(0, 0)
-        exec = sim.run(psi[i], shots=1).result()
-        result = int(list(exec.get_counts(psi[i]).keys())[0])
-        results.append(result)
-    return results
-
-def c_aprox_gen(results, d, w):
-    c_aprox = []
-    for i, bit in enumerate(results):
-        # if bit == w[i] gamma[i]; else !gamma[i]
-        decission = int(d[i] ^ (bit != w[i]))
-        c_aprox.append(decission)
-    return c_aprox
-
-def equal_entries_percentage(list1, list2):
-    if len(list1) != len(list2):
-        raise ValueError("The lists must have the same length.")
-    equals = 0
-    for (a, b) in zip(list1, list2):
-        equals += int(a == b)
-    return (equals / len(list1)) * 100
+import argparse
+import numpy as np
+from qzkp.protocol import CircuitProtocol, equal_entries_percentage
+from qzkp.randomness import RandomSource
+from qzkp.stabilizer import StabilizerBackend
 
 #----------------------------------------
 # Protocol execution
 #----------------------------------------
 if __name__ == '__main__':
     
-    sim = AerSimulator()
-    key_length = int(sys.argv[1])
-    b = tuple(quantum_random_binary_string(key_length))
-    a = tuple(quantum_random_binary_string(key_length))
-    verbose = False
-    if len(sys.argv) == 3:
-        if str(sys.argv[2]) == 'v':
-            verbose = True
+    parser = argparse.ArgumentParser(description='Single run of the conjugate coding QZKP.')
+    parser.add_argument('key_length', type=int)
+    parser.add_argument('verbose', nargs='?', default='', help="'v' prints every step")
+    parser.add_argument('--batch-size', type=int, default=0, help='qubits per simulator job, 0 runs one job per qubit')
+    parser.add_argument('--grouped', action='store_true', help='run each distinct qubit circuit once with one shot per qubit sharing it')
+    parser.add_argument('--wide', action='store_true', help='pack each batch into one wide circuit, the whole measurement with --batch-size 0 (Clifford circuits only)')
+    parser.add_argument('--backend', choices=['aer', 'numpy'], default='aer', help='circuit simulation with Aer or the vectorized NumPy stabilizer engine')
+    parser.add_argument('--rng', choices=['quantum', 'numpy', 'os'], default='quantum', help='source of random keys, challenges and bases')
+    parser.add_argument('--seed', type=int, default=None, help='seed of the random bits and the simulator jobs, reproducible with --rng numpy')
+    args = parser.parse_args()
+
+    # Qiskit takes most of the startup time, it is only imported when needed.
+    sim = None
+    if args.backend == 'aer' or args.rng == 'quantum':
+        from qiskit_aer import AerSimulator
+
+        sim = AerSimulator()
+    rand_seed, engine_seed = np.random.SeedSequence(args.seed).spawn(2)
+    rand = RandomSource(args.rng, sim, rand_seed)
+    if args.backend == 'numpy':
+        engine = StabilizerBackend(seed=engine_seed)
+    else:
+        engine = CircuitProtocol(sim, batch_size=args.batch_size, grouped=args.grouped, wide=args.wide)
+        if args.seed is not None:
+            engine.reseed(engine_seed)
+    key_length = args.key_length
+    b = tuple(rand.bits(key_length).tolist())
+    a = tuple(rand.bits(key_length).tolist())
+    verbose = args.verbose == 'v'
 
     # 2. Preparation of the challenge (Bob)
-    psi = psi_gen(a, b) # |psi> state generation from a and b
+    psi = engine.psi_gen(a, b) # |psi> state generation from a and b
 
-    c = tuple(quantum_random_binary_string(key_length)) # Random generation for c
-    challenge_state = challenge_gen(psi, c, b) # Challenge setup
+    c = tuple(rand.bits(key_length).tolist()) # Random generation for c
+    challenge_state = engine.challenge_gen(psi, c, b) # Challenge setup
 
     # After this, Bob sends the modified qubits to Alice 
 
     # 3.  Alice modification's
 
-    proof_state = alice_mod(challenge_state, a, b)
+    proof_state = engine.alice_mod(challenge_state, a, b)
 
     # Alice send the proof state to Bob.
 
     # 6. Bob retrieves c.
-    b_xor_c = measurements(proof_state, a)
+    b_xor_c = [int(bit) for bit in engine.measurements(proof_state, a)]
     c_aprox = tuple(i ^j for i,j in zip(b, b_xor_c))
     equal_percentage = equal_entries_percentage(c, c_aprox)
 
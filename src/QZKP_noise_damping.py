@@ -1,216 +1,170 @@
-from qiskit import QuantumCircuit, transpile
-from qiskit_aer import AerSimulator
-from qiskit_aer.noise import NoiseModel, phase_amplitude_damping_error
-import random
-import matplotlib.pyplot as plt
-import numpy as np
-import seaborn as sns
+import argparse
 import time
-import sys
-import pandas as pd
+import numpy as np
+from qzkp.analytic import sample_rounds
+from qzkp.channels import STAGES, parse_noise
+from qzkp.bitvec import BitVector
+from qzkp.noise import damping_circuit_channels, damping_noise_model
+from qzkp.parallel import iter_parallel
+from qzkp.profiling import Profiler
+from qzkp.protocol import CircuitProtocol, loading_bar, run_protocol_round
+from qzkp.randomness import RandomSource
+from qzkp.seeding import reseed, round_seed
+from qzkp.results import EXTRA_COLUMNS, ResultWriter, result_columns, result_row
+from qzkp.stats import AccuracyStats
+from qzkp.verifier import Verifier, acceptance_threshold
 
 #----------------------------------------
-# Auxiliary functions
+# Protocol round
 #----------------------------------------
-def quantum_random_binary_string(length):
-    '''
-    Random key generator using quantum randomness.
-    '''
-    string = []
-    for bit in range(length):
-        qcoin = QuantumCircuit(1,1)
-        qcoin.h(0)
-        qcoin.measure(0,0)
-        exec = sim.run(qcoin, shots=1).result()
-        string.append(int(list(exec.get_counts(qcoin).keys())[0]))
-    return string
-
-
-def psi_gen(a, b):
-    '''
-    Generation of the quantum state |psi>.
-    '''
-    if len(a) != len(b):
-        raise ValueError('Same number of b and bits expected.')
-    psi = []
-    for i in range(len(a)):
-        qubit = QuantumCircuit(1, 1)
-        if a[i] == 1:
-            qubit.x(0)
-        if b[i] == 1:
-            qubit.h(0)
-        psi.append(qubit)
-    return psi
-
-def challenge_gen(psi, c, b):
+def setup(seed_seq, settings):
     '''
-    Generation of the challenge for |psi>.
+    Noisy simulator and random source used by protocol_round, built in the
+    main process or once per worker of the parallel driver from the run
+    settings (an argparse.Namespace, see the config below).
     '''
-    if len(psi) != len(c):
-        raise ValueError('Same number of qubits and bits expected.')
-    for i in range(len(psi)):
-        if c[i] == 1:
-            if b[i]==0:
-                psi[i].x(0)
-            else:
-                psi[i].z(0)
-    return psi
-
-def alice_mod(psi, a, b):
-    if len(psi) != len(a) or len(psi) != len(a):
-        raise ValueError('Same number of qubits and bits expected.')
-    a_xor_b = tuple(i ^ j for i,j in zip(a,b))
-    for i in range(len(psi)):
-        if b[i] == 1:
-            psi[i].z(0)
-        if a_xor_b[i] == 1:
-            psi[i].h(0)
-        if a[i] == 1:
-            psi[i].z(0)
-    return psi
-
-def measurements(psi, b):
-    '''
-    Alice measures using the secret b.
-    '''
-    if len(psi) != len(b):
-        raise ValueError('Same number of qubits and b expected.')
-    results = []
-    for i in range(len(psi)):
-        if b[i] == 1:
-            psi[i].h(0)
-        psi[i].measure(0, 0)
-        psi[i] = transpile(psi[i], sim)
-        exec = sim.run(psi[i], shots=1).result()
-        result = int(list(exec.get_counts(psi[i]).keys())[0])
-        results.append(result)
-    return results
-
-def c_aprox_gen(results, p, a):
-    '''
-    Generation of the approximation c' for c.
-    '''
-    c_aprox = []
-    for i, bit in enumerate(results):
-        # if bit == a[i] gamma[i]; else !gamma[i]
-        decission = int(p[i] ^ (bit != a[i]))
-        c_aprox.append(decission)
-    return c_aprox
-
-def equal_entries_percentage(list1, list2):
+    global config, engine, rand, cache, profiler
+    from qiskit_aer import AerSimulator
+
+    config = settings
+    profiler = Profiler(config.profile, config.trace)
+    sim = profiler.instrument(AerSimulator(noise_model=damping_noise_model(config.gamma, config.lam)))
+    rand = RandomSource(config.rng, sim, seed_seq)
+    engine = CircuitProtocol(sim, config.cache_size, config.batch_size, config.grouped, config.wide, transpiled=True,
+                             profiler=profiler, stages=config.stage_noise)
+    cache = engine.cache
+
+def protocol_round(iteration):
     '''
-    Percentage of equal entries.
+    One round against a randomly chosen honest (0) or dishonest (1) prover,
+    returns (equal_percentage, dec).
     '''
-    if len(list1) != len(list2):
-        raise ValueError("The lists must have the same length.")
-    equals = 0
-    for (a, b) in zip(list1, list2):
-        equals += int(a == b)
-    return (equals / len(list1)) * 100
-
-def random_binary_string(length):
-    '''
-    Pseudo random binary strings.
-    '''
-    return [random.choice([0, 1]) for _ in range(length)]
-
-def loading_bar(iteration, total, start_time, prefix='Progress:', length=50, fill='█', print_end='\r'):
-    """
-    Progress bar.
-    """
-    percent = 100 * (iteration / total)
-    filled_length = int(length * iteration // total)
-    bar = fill * filled_length + '-' * (length - filled_length)
-    elapsed_time = time.time() - start_time
-    print(f'\r{prefix} |{bar}| {percent:.1f}% Elapsed: {elapsed_time:.1f}s', end=print_end)
-    if iteration == total:
-        print()
+    if config.rounds_seed is not None:
+        reseed(config.rounds_seed, iteration, rand, engine)
+    return run_protocol_round(engine, rand, config.a, config.b, config.attack, profiler)
 
 #----------------------------------------
 # Protocol execution
 #----------------------------------------
 if __name__=='__main__':
 
-    key_length = int(sys.argv[1])
-    num_iter = int(sys.argv[2])
-    gamma = float(sys.argv[3]) # Probabilidad of amplitude damping
-    lam = float(sys.argv[4]) # Probability of phase damping
-    attack = True
-    
-    
-    noise_model = NoiseModel()
-    error = error = phase_amplitude_damping_error(gamma, lam)
-    noise_model.add_all_qubit_quantum_error(error, ['h', 'measure'])
-    sim = AerSimulator(noise_model=noise_model)
-    percentages = []
+    parser = argparse.ArgumentParser(description='QZKP under phase-amplitude damping noise.')
+    parser.add_argument('key_length', type=int)
+    parser.add_argument('num_iter', type=int)
+    parser.add_argument('gamma', type=float)
+    parser.add_argument('lam', type=float)
+    parser.add_argument('--batch-size', type=int, default=0, help='qubits per simulator job, 0 runs one job per qubit')
+    parser.add_argument('--grouped', action='store_true', help='run each distinct qubit circuit once with one shot per qubit sharing it')
+    parser.add_argument('--rng', choices=['quantum', 'numpy', 'os'], default='quantum', help='source of random keys, challenges and bases')
+    parser.add_argument('--seed', type=int, default=None, help='seed of every random stream (keys, rounds, simulator jobs, noise), reproducible with --rng numpy')
+    parser.add_argument('--analytic', action='store_true', help='sample the rounds from the exact accuracy distributions of the transpiled circuits, evolved once each as density matrices, instead of simulating')
+    parser.add_argument('--stage-noise', nargs='+', default=[], metavar='STAGE:CHANNEL:P', help=f'extra noise channels per protocol stage, stages: {", ".join(STAGES)}')
+    parser.add_argument('--cache', type=int, default=0, help='keep up to N distinct qubit circuits built and transpiled once, 0 disables')
+    parser.add_argument('--workers', type=int, default=1, help='processes running the rounds, 0 uses every core')
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv', help='results file format, parquet is written as a directory of chunks and needs pyarrow')
+    parser.add_argument('--flush-every', type=int, default=10000, help='rounds buffered in memory before being appended to the results')
+    parser.add_argument('--columns', nargs='+', choices=list(EXTRA_COLUMNS), default=[], help="extra per round columns: matches, time (seconds), accept (Bob's decision), seed (round seed, with --seed)")
+    parser.add_argument('--max-far', type=float, default=None, help='accept threshold with the lowest false reject rate at this false accept rate, default minimizes their sum')
+    parser.add_argument('--stop-confidence', type=float, default=None, help='stop once the honest mean accuracy exceeds the attack one with this confidence, held over every round checked (alpha spending), e.g. 0.999')
+    parser.add_argument('--stop-precision', type=float, default=None, help='stop once the confidence interval of every mean accuracy is within ± this many percentage points')
+    parser.add_argument('--min-rounds', type=int, default=30, help='rounds of every class before an early stop is considered')
+    parser.add_argument('--stats-json', default=None, help='write the means, confidence intervals and histograms to this JSON file')
+    parser.add_argument('--profile', action='store_true', help='print wall time, calls and simulator jobs per protocol stage')
+    parser.add_argument('--profile-json', default=None, help='write the stage report and the stage times of every round to this JSON file')
+    parser.add_argument('--trace', default=None, help='write every stage as a Chrome trace (chrome://tracing, Perfetto) to this file')
+    args = parser.parse_args()
+    try:
+        parse_noise(args.stage_noise)
+    except ValueError as error:
+        parser.error(str(error))
+    profile = args.profile or args.profile_json is not None or args.trace is not None
+    if profile and args.workers != 1:
+        parser.error('profiling runs in a single process, use --workers 1')
+
+    keys_seed, rounds_seed, workers_seed = np.random.SeedSequence(args.seed).spawn(3)
+    config = argparse.Namespace(
+        key_length=args.key_length,
+        gamma=args.gamma, # Probabilidad of amplitude damping
+        lam=args.lam, # Probability of phase damping
+        batch_size=args.batch_size,
+        grouped=args.grouped,
+        wide=False, # Damping is not Clifford, wide circuits would need 2^n amplitudes
+        rng=args.rng,
+        cache_size=args.cache,
+        stage_noise=','.join(args.stage_noise),
+        profile=profile,
+        trace=args.trace is not None,
+        attack=True,
+        # Seeded Aer measurements run in fixed seed blocks instead of --batch-size jobs, so rounds are only reseeded when a seed is given.
+        rounds_seed=rounds_seed if args.seed is not None else None,
+    )
+    key_length, num_iter, attack = args.key_length, args.num_iter, config.attack
+    gamma, lam, stage_noise = args.gamma, args.lam, config.stage_noise
+    setup(keys_seed, config)
 
     start_time = time.time()
 
-    b = quantum_random_binary_string(key_length)
-    a = quantum_random_binary_string(key_length)
-
+    with profiler.stage('keys'):
+        b = BitVector(rand.bits(key_length))
+        a = BitVector(rand.bits(key_length))
+    config.a, config.b = a, b
     if attack:
         print('--- Simulations with attacker ---\n')
-        a_xor_b = tuple(i ^ j for i, j in zip(a, b))
-    
-    iter=1
-    for i in range(num_iter):
-        dec = random.choice([0, 1])
-        # 1. Keys generation (this keys could be shared through QKD)
-
-        # 2. Preparation of the challenge (Bob)
-        psi = psi_gen(a, b) # |psi> state generation from a and b
-
-        c = quantum_random_binary_string(key_length) # Random generation for c
-        challenge_state = challenge_gen(psi, c, b) # Challenge setup
-
-        # After this, Bob sends the modified qubits to Alice 
-
-
-        if dec == 0:
-            # Honest prover Alice
-
-            # 3.  Alice modification's
-
-            proof_state = alice_mod(challenge_state, a, b)
-
-            # Alice send the proof state to Bob.
-
-            # 6. Bob retrieves c.
-            b_xor_c = measurements(proof_state, a)
-            c_aprox = tuple(i ^j for i,j in zip(b, b_xor_c))
-            equal_percentage = equal_entries_percentage(c, c_aprox)
-            percentages.append((equal_percentage, dec))
 
+    progress = lambda done, total: loading_bar(done, total, start_time)
+    # Round seeds only exist for reseeded rounds, i.e. with --seed.
+    seed_of = lambda i: round_seed(config.rounds_seed, i) if config.rounds_seed is not None and 'seed' in args.columns else None
+    stats = AccuracyStats(args.stop_confidence, precision=args.stop_precision, min_rounds=args.min_rounds)
+    stages = f'_stages={stage_noise}' if stage_noise else ''
+    output = f'iter_damping_error_data{"_analytic" if args.analytic else ""}_attack={attack}_{key_length}_{num_iter}_{gamma}_{lam}{stages}.{args.format}'
+    # Probabilities of the circuits as the script transpiles and runs them, for Bob's threshold and --analytic.
+    channels = damping_circuit_channels(gamma, lam, stage_noise)
+    verifier = Verifier(acceptance_threshold(key_length, channels, attack, a, b, args.max_far))
+    with ResultWriter(output, result_columns(extra=args.columns), args.format, args.flush_every) as writer:
+        if args.analytic:
+            rounds = sample_rounds(num_iter, key_length, channels, a, b, attack, np.random.default_rng(rounds_seed))
+            for i, (percentage, dec) in enumerate(rounds):
+                accepted = verifier.record(round(percentage * key_length / 100), dec)
+                writer.write(result_row(i, percentage, dec, key_length, extra=args.columns, accepted=accepted))
+                stats.update(percentage, dec)
+                if stats.should_stop():
+                    break
+        elif args.workers != 1:
+            for i, (percentage, dec), seconds in iter_parallel(protocol_round, num_iter, args.workers, setup, (config,), workers_seed):
+                accepted = verifier.record(round(percentage * key_length / 100), dec)
+                writer.write(result_row(i, percentage, dec, key_length, seconds, args.columns, accepted, seed_of(i)))
+                progress(i + 1, num_iter)
+                stats.update(percentage, dec)
+                if stats.should_stop():
+                    break
         else:
-            if attack == True:
-                # 3. Eve (which has access to a XOR b) meassures the challenge state randomly and generates the attakc estimation
-                r = random_binary_string(key_length)
-                measure_results = measurements(challenge_state, r)
-                attack_estimation = tuple(i ^ j for i,j in zip(a_xor_b, measure_results))
-        
-                # 4. Eve generates the attack state encoding the attack estimaiton with ranodm bassis
-                r = random_binary_string(key_length)
-                attack_state = psi_gen(attack_estimation, r)
-                # 5. Eve sends the attack state to Bob and he measures and count matches
-                results = measurements(attack_state, a)
-                c_aprox = tuple(i ^j for i,j in zip(b, results))
-                equal_percentage = equal_entries_percentage(c, c_aprox)
-                percentages.append((equal_percentage, dec))
-            else:
-                # Dishonest prover Eve
-                c_aprox = random_binary_string(key_length)
-                equal_percentage = equal_entries_percentage(c, c_aprox)
-                percentages.append((equal_percentage, dec))
-        loading_bar(iter, num_iter, start_time)
-        iter +=1
-
-    #----------------------------------------
-    # Data
-    #----------------------------------------
-    equal_percentages = [x[0] for x in percentages]
-    decisions = [x[1] for x in percentages]
-
-    iters = range(1,num_iter + 1)
-    results = pd.DataFrame({'Iteration': iters, 'Decision': decisions, 'Percentages': equal_percentages})
-    results.to_csv(f'iter_damping_error_data_attack={attack}_{key_length}_{num_iter}_{gamma}_{lam}.csv', index=False)
+            for i in range(num_iter):
+                start = time.perf_counter()
+                with profiler.stage('round', i):
+                    percentage, dec = protocol_round(i)
+                seconds = time.perf_counter() - start
+                accepted = verifier.record(round(percentage * key_length / 100), dec)
+                with profiler.stage('output'):
+                    writer.write(result_row(i, percentage, dec, key_length, seconds, args.columns, accepted, seed_of(i)))
+                progress(i + 1, num_iter)
+                stats.update(percentage, dec)
+                if stats.should_stop():
+                    break
+
+    print(f'Density matrix evolutions: {len(channels.probabilities)}')
+    if cache and args.workers == 1:
+        print(f'Circuit cache: {cache.stats()}')
+
+    if stats.stopped_at is not None:
+        print() # An early stop leaves the progress bar line open
+    print(stats.format_summary())
+    print(verifier.format_report())
+    if args.stats_json:
+        stats.write_json(args.stats_json)
+
+    if args.profile:
+        print(profiler.format_report())
+    if args.profile_json:
+        profiler.write_json(args.profile_json)
+    if args.trace:
+        profiler.write_trace(args.trace)
@@ -0,0 +1,35 @@
+'''
+Shared building blocks for the conjugate coding QZKP scripts.
+
+Submodules are imported on first attribute access, so `import qzkp` stays
+cheap and Qiskit or pandas are only loaded by the code paths using them.
+'''
+import importlib
+
+# Public name -> submodule defining it.
+_EXPORTS = {
+    'AccuracyStats': 'stats',
+    'BitVector': 'bitvec',
+    'CircuitProtocol': 'protocol',
+    'MultiSessionVerifier': 'sessions',
+    'Profiler': 'profiling',
+    'RandomSource': 'randomness',
+    'ResultWriter': 'results',
+    'StabilizerBackend': 'stabilizer',
+    'Verifier': 'verifier',
+    'acceptance_threshold': 'verifier',
+    'read_results': 'results',
+    'run_attack_round': 'protocol',
+    'run_protocol_round': 'protocol',
+    'run_rounds': 'batch',
+}
+
+__all__ = sorted(_EXPORTS)
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(f'{__name__}.{_EXPORTS[name]}'), name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
@@ -0,0 +1,188 @@
+import argparse
+import math
+import numpy as np
+from qzkp.analytic import flip_channels
+from qzkp.batch import BLOCK_QUBITS
+from qzkp.channels import bloch_channels, combine_channels, parse_noise, pauli_channels
+from qzkp.stabilizer import QubitArray, StabilizerBackend
+from qzkp.verifier import acceptance_threshold, count_matches
+
+
+#----------------------------------------
+# Strategies
+#----------------------------------------
+# Error of reading a Z or X eigenstate in the Breidbart basis, or from an
+# optimal phase covariant clone, cos²(π/8) being the success probability.
+BREIDBART_ERROR = math.sin(math.pi / 8) ** 2
+
+def _bases(basis, shape, rng):
+    if basis is None:
+        return rng.integers(0, 2, size=shape, dtype=np.uint8)
+    return np.full(shape, basis, dtype=np.uint8)
+
+def _read(psi, rng):
+    '''
+    Value of every qubit read with the Breidbart error.
+    '''
+    return psi.bit ^ (rng.random(psi.bit.shape) < BREIDBART_ERROR)
+
+class InterceptResend:
+    '''
+    Eve measures the challenge state in the measure basis and resends
+    a ^ b ^ outcome in the resend basis, a random basis per qubit when None.
+    With fraction < 1 only that share of the qubits is intercepted and the
+    rest is forwarded unchanged.
+    '''
+    def __init__(self, measure=None, resend=None, fraction=1.0):
+        self.measure = measure
+        self.resend = resend
+        self.fraction = fraction
+
+    def __call__(self, backend, psi, a_xor_b, rng):
+        shape = psi.bit.shape
+        forwarded = QubitArray(psi.bit, psi.basis, psi.pbit, psi.pphase, psi.rng) if self.fraction < 1 else None
+        outcome = backend.measurements(psi, _bases(self.measure, shape, rng))
+        state = backend.psi_gen(a_xor_b ^ outcome, _bases(self.resend, shape, rng))
+        if forwarded is not None:
+            keep = np.broadcast_to(rng.random(shape) >= self.fraction, state.bit.shape)
+            state.bit[keep] = forwarded.bit[keep]
+            state.basis[keep] = forwarded.basis[keep]
+        return state
+
+class Breidbart:
+    '''
+    Eve measures in the Breidbart basis, halfway between Z and X, which
+    reads the value of either basis with error sin²(π/8), and resends the
+    estimate in the resend basis (random when None).
+    '''
+    def __init__(self, resend=None):
+        self.resend = resend
+
+    def __call__(self, backend, psi, a_xor_b, rng):
+        outcome = _read(backend.noise(psi, 'measure'), rng)
+        return backend.psi_gen(a_xor_b ^ outcome, _bases(self.resend, psi.bit.shape, rng))
+
+class Cloning:
+    '''
+    Approximation of an optimal phase covariant 1 -> 2 cloning attack: Eve
+    reads one clone in Z and one in X, each correct with probability
+    cos²(π/8) when it is the preparation basis and random otherwise. She
+    guesses b per qubit, takes the matching reading and resends it in the
+    basis a = b ^ a_xor_b that guess implies.
+    '''
+    def __call__(self, backend, psi, a_xor_b, rng):
+        shape = psi.bit.shape
+        guess = rng.integers(0, 2, size=shape, dtype=np.uint8)
+        psi = backend.noise(psi, 'measure')
+        coin = rng.integers(0, 2, size=shape, dtype=np.uint8)
+        outcome = np.where(psi.basis == guess, _read(psi, rng), coin)
+        return backend.psi_gen(a_xor_b ^ outcome, guess ^ a_xor_b)
+
+class Guess:
+    '''
+    Eve ignores the challenge and sends random values in random bases, so
+    every recovered bit is a coin flip.
+    '''
+    def __call__(self, backend, psi, a_xor_b, rng):
+        shape = psi.bit.shape
+        return backend.psi_gen(_bases(None, shape, rng), _bases(None, shape, rng))
+
+# Strategy name -> factory taking the optional parameter of 'name:parameter'.
+STRATEGIES = {
+    'intercept_resend': lambda: InterceptResend(),
+    'fixed_basis': lambda basis='0': InterceptResend(int(basis), int(basis)),
+    'partial': lambda fraction='0.5': InterceptResend(fraction=float(fraction)),
+    'breidbart': lambda: Breidbart(),
+    'cloning': lambda: Cloning(),
+    'guess': lambda: Guess(),
+}
+
+def make_adversary(spec):
+    '''
+    Strategy of a 'name' or 'name:parameter' spec, e.g. 'partial:0.25'.
+    '''
+    name, _, parameter = spec.partition(':')
+    if name not in STRATEGIES:
+        raise ValueError(f'Unknown adversary {name!r}, expected one of {tuple(STRATEGIES)}.')
+    return STRATEGIES[name](*([parameter] if parameter else []))
+
+
+#----------------------------------------
+# Batched evaluation
+#----------------------------------------
+def compare(a, b, rounds, adversaries, pbit=0.0, pphase=0.0, stages=None, seed=None, block_rounds=None):
+    '''
+    (rounds,) match counts of the honest prover and of every adversary (a
+    dict name -> strategy) on the stabilizer engine. All of them answer the
+    same challenges, so the challenge preparation is shared and only the
+    prover side runs once per strategy.
+    '''
+    a = np.asarray(a, dtype=np.uint8)
+    b = np.asarray(b, dtype=np.uint8)
+    if a.shape != b.shape or a.ndim != 1:
+        raise ValueError('Keys a and b of the same length expected.')
+    key_length = len(a)
+    rng = np.random.default_rng(seed)
+    backend = StabilizerBackend(pbit, pphase, rng, stages)
+    block_rounds = block_rounds or max(1, BLOCK_QUBITS // max(key_length, 1))
+    matches = {name: np.empty(rounds, dtype=np.int64) for name in ['honest', *adversaries]}
+    for start in range(0, rounds, block_rounds):
+        stop = min(start + block_rounds, rounds)
+        c = rng.integers(0, 2, size=(stop - start, key_length), dtype=np.uint8)
+        challenge = backend.challenge_gen(backend.psi_gen(np.broadcast_to(a, c.shape), b), c, b)
+        challenge = backend.noise(challenge, 'prepare', 'to_prover')
+        for name in matches:
+            psi = QubitArray(challenge.bit, challenge.basis, challenge.pbit, challenge.pphase, challenge.rng)
+            if name == 'honest':
+                state = backend.noise(backend.alice_mod(psi, a, b), 'prover', 'to_verifier')
+            else:
+                state = backend.noise(adversaries[name](backend, psi, a ^ b, rng), 'to_verifier')
+            matches[name][start:stop] = count_matches(c, b ^ backend.measurements(state, a))
+    return matches
+
+def summarize(matches, key_length, threshold):
+    '''
+    Mean, standard deviation, pmf over 0..key_length and acceptance rate at
+    the threshold of every match count array.
+    '''
+    summary = {}
+    for name, counts in matches.items():
+        summary[name] = {'mean': float(counts.mean()), 'std': float(counts.std()),
+                         'pmf': np.bincount(counts, minlength=key_length + 1) / len(counts),
+                         'accept_rate': float(np.mean(counts >= threshold.matches))}
+    return summary
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Match count distributions of adversary strategies next to the honest prover.')
+    parser.add_argument('key_length', type=int)
+    parser.add_argument('rounds', type=int)
+    parser.add_argument('--adversaries', nargs='+', default=list(STRATEGIES), help=f'name or name:parameter, of {", ".join(STRATEGIES)}')
+    parser.add_argument('--pbit', type=float, default=0.0)
+    parser.add_argument('--pphase', type=float, default=0.0)
+    parser.add_argument('--stage-noise', nargs='+', default=[], metavar='STAGE:CHANNEL:P')
+    parser.add_argument('--max-far', type=float, default=None, help='threshold at this false accept rate against intercept-resend')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--output', default=None, help='npz file for the match count pmfs')
+    args = parser.parse_args()
+
+    try:
+        adversaries = {spec: make_adversary(spec) for spec in args.adversaries}
+        stages = parse_noise(args.stage_noise)
+        pauli_channels(stages)
+    except ValueError as error:
+        parser.error(str(error))
+    keys_seed, rounds_seed = np.random.SeedSequence(args.seed).spawn(2)
+    a, b = np.random.default_rng(keys_seed).integers(0, 2, size=(2, args.key_length), dtype=np.uint8)
+    channels = combine_channels(flip_channels(args.pbit, args.pphase), bloch_channels(stages))
+    threshold = acceptance_threshold(args.key_length, channels, True, a, b, args.max_far)
+    matches = compare(a, b, args.rounds, adversaries, args.pbit, args.pphase, stages, rounds_seed)
+    summary = summarize(matches, args.key_length, threshold)
+
+    print(f'Threshold: {threshold.matches}/{args.key_length} matches')
+    print(f'{"prover":<20}{"mean":>10}{"std":>10}{"accepted":>12}')
+    for name, row in summary.items():
+        print(f'{name:<20}{row["mean"]:>10.2f}{row["std"]:>10.2f}{row["accept_rate"]:>12.4f}')
+    if args.output:
+        np.savez(args.output, **{name: row['pmf'] for name, row in summary.items()})
@@ -0,0 +1,201 @@
+import numpy as np
+from qzkp.channels import STAGES, aer_errors, parse_noise
+
+
+#----------------------------------------
+# Bloch vector evolution
+#----------------------------------------
+# Gates act on the Bloch vector (x, y, z) of a single qubit.
+GATES = {
+    'x': lambda x, y, z: (x, -y, -z),
+    'z': lambda x, y, z: (-x, -y, z),
+    'h': lambda x, y, z: (z, -y, x),
+}
+
+def flip_channels(pbit, pphase):
+    '''
+    Bit-flip then phase-flip after every x, z and h gate except the Hadamard
+    of psi_gen ('h_prep'), as in QZKP_noise_flip.py.
+    '''
+    def channel(x, y, z):
+        return ((1 - 2*pphase)*x, (1 - 2*pbit)*(1 - 2*pphase)*y, (1 - 2*pbit)*z)
+    return {'x': channel, 'z': channel, 'h': channel}
+
+def evolve(gates, channels):
+    '''
+    Bloch vector of |0> after the named gates, each followed by its channel.
+    'h_prep' is the Hadamard of psi_gen, the qzkp.channels stages ('measure'
+    included) are markers that only apply a channel.
+    '''
+    state = (0.0, 0.0, 1.0)
+    for gate in gates:
+        if gate not in STAGES:
+            state = GATES[gate[0]](*state)
+        if gate in channels:
+            state = channels[gate](*state)
+    return state
+
+def prob_one(gates, channels):
+    '''
+    Probability of measuring 1 after the gates. channels may also be a
+    CircuitChannels, which evaluates the gates on a simulator.
+    '''
+    if isinstance(channels, CircuitChannels):
+        return channels.prob_one(gates)
+    return (1 - evolve(gates, channels)[2]) / 2
+
+
+#----------------------------------------
+# Density matrix evaluation
+#----------------------------------------
+class CircuitChannels:
+    '''
+    Exact probabilities of the single qubit circuits as sim really runs
+    them, in place of a channels dict: every distinct gate sequence is
+    built like the protocol builds it, transpiled for sim (which may merge
+    gates) and evolved once with the density matrix method under sim's
+    noise model. The probabilities are saved before measuring, so the error
+    the noise model adds before measurements is passed as measure_error and
+    applied explicitly. prep_h replaces the Hadamard of psi_gen
+    ('h_prep') and stages adds qzkp.channels stage noise, as in
+    CircuitProtocol.
+    '''
+    def __init__(self, sim, measure_error=None, prep_h=None, transpiled=True, stages=None):
+        self.sim = sim
+        self.measure_error = measure_error
+        self.prep_h = prep_h
+        self.transpiled = transpiled
+        self.errors = aer_errors(parse_noise(stages or {}))
+        self.probabilities = {}
+
+    def circuit(self, gates):
+        from qiskit import QuantumCircuit, transpile
+        from qiskit_aer.library import SaveProbabilities
+
+        circuit = QuantumCircuit(1)
+        for gate in gates:
+            if gate == 'h_prep' and self.prep_h is not None:
+                self.prep_h(circuit)
+            elif gate in self.errors and gate != 'measure':
+                circuit.append(self.errors[gate].to_instruction(), [0])
+            elif gate not in STAGES:
+                getattr(circuit, gate[0])(0)
+        if self.transpiled:
+            circuit = transpile(circuit, self.sim)
+        if 'measure' in gates:
+            for error in (self.measure_error, self.errors.get('measure')):
+                if error is not None:
+                    circuit.append(error.to_instruction(), [0])
+        circuit.append(SaveProbabilities(1), [0])
+        return circuit
+
+    def prob_one(self, gates):
+        key = tuple(gates)
+        if key not in self.probabilities:
+            result = self.sim.run(self.circuit(key), method='density_matrix').result()
+            self.probabilities[key] = float(result.data(0)['probabilities'][1])
+        return self.probabilities[key]
+
+
+#----------------------------------------
+# Per bit success probabilities
+#----------------------------------------
+def challenge_gates(a, b, c):
+    gates = ['x'] * a + ['h_prep'] * b
+    if c:
+        gates += ['z'] if b else ['x']
+    return gates
+
+def honest_success(a, b, c, channels):
+    '''
+    Probability that Bob recovers c from an honest proof (c_aprox = b ^ result).
+    '''
+    gates = challenge_gates(a, b, c) + ['prepare', 'to_prover'] + ['z'] * b + ['h'] * (a ^ b) + ['z'] * a
+    p1 = prob_one(gates + ['prover', 'to_verifier'] + ['h'] * a + ['measure'], channels)
+    return p1 if b ^ c else 1 - p1
+
+def attack_success(a, b, c, channels):
+    '''
+    Same for Eve's intercept-resend attack: random basis measurement, XOR with
+    a_xor_b and re-encoding in a second random basis.
+    '''
+    success = 0.0
+    for r1 in (0, 1):
+        m1 = prob_one(challenge_gates(a, b, c) + ['prepare', 'to_prover'] + ['h'] * r1 + ['measure'], channels)
+        for m, pm in ((0, 1 - m1), (1, m1)):
+            e = a ^ b ^ m
+            for r2 in (0, 1):
+                p1 = prob_one(['x'] * e + ['h_prep'] * r2 + ['to_verifier'] + ['h'] * a + ['measure'], channels)
+                success += pm * (p1 if b ^ c else 1 - p1) / 4
+    return success
+
+def bit_success(a, b, channels, prover='honest'):
+    '''
+    Probability that c_aprox matches c on a key bit with secrets (a, b),
+    averaged over the uniform challenge bit. prover is 'honest', 'attack'
+    (intercept-resend) or 'guess' (random c_aprox).
+    '''
+    if prover == 'guess':
+        return 0.5
+    success = {'honest': honest_success, 'attack': attack_success}[prover]
+    return (success(a, b, 0, channels) + success(a, b, 1, channels)) / 2
+
+
+#----------------------------------------
+# Match count distributions
+#----------------------------------------
+def binomial_pmf(n, p):
+    k = np.arange(n + 1)
+    if p <= 0 or p >= 1:
+        return (k == (n if p >= 1 else 0)).astype(float)
+    log_comb = np.concatenate(([0.0], np.cumsum(np.log(n - k[1:] + 1) - np.log(k[1:]))))
+    return np.exp(log_comb + k*np.log(p) + (n - k)*np.log1p(-p))
+
+def convolve(p, q):
+    if min(len(p), len(q)) < 512:
+        return np.convolve(p, q)
+    size = len(p) + len(q) - 1
+    pmf = np.fft.irfft(np.fft.rfft(p, size) * np.fft.rfft(q, size), size)
+    return np.clip(pmf, 0, None)
+
+def match_distribution(key_length, channels, prover='honest', a=None, b=None):
+    '''
+    Exact pmf of the number of matches between c and c_aprox in one round.
+    With the keys a and b it is a convolution of one binomial per (a_i, b_i)
+    class, without them the key bits are uniform and it is a single binomial.
+    '''
+    if a is None or b is None:
+        p = np.mean([bit_success(i, j, channels, prover) for i in (0, 1) for j in (0, 1)])
+        pmf = binomial_pmf(key_length, p)
+        return pmf / pmf.sum()
+    a = np.asarray(a)
+    b = np.asarray(b)
+    if len(a) != key_length or len(b) != key_length:
+        raise ValueError('Keys of key_length bits expected.')
+    pmf = np.ones(1)
+    for i in (0, 1):
+        for j in (0, 1):
+            n = int(np.sum((a == i) & (b == j)))
+            pmf = convolve(pmf, binomial_pmf(n, bit_success(i, j, channels, prover)))
+    return pmf / pmf.sum()
+
+def accuracy_distribution(key_length, channels, prover='honest', a=None, b=None):
+    '''
+    Possible values of equal_entries_percentage and their probabilities.
+    '''
+    pmf = match_distribution(key_length, channels, prover, a, b)
+    return np.arange(key_length + 1) / key_length * 100, pmf
+
+def sample_rounds(num_iter, key_length, channels, a=None, b=None, attack=True, rng=None):
+    '''
+    (equal_percentage, dec) for num_iter rounds drawn from the exact
+    distributions, with the same random honest/dishonest choice as the scripts.
+    '''
+    rng = rng if rng is not None else np.random.default_rng()
+    percentages, honest = accuracy_distribution(key_length, channels, 'honest', a, b)
+    _, dishonest = accuracy_distribution(key_length, channels, 'attack' if attack else 'guess', a, b)
+    decisions = rng.integers(0, 2, size=num_iter)
+    samples = np.where(decisions == 0,
+                       rng.choice(percentages, size=num_iter, p=honest),
+                       rng.choice(percentages, size=num_iter, p=dishonest))
+    return [(float(p), int(dec)) for p, dec in zip(samples, decisions)]
@@ -0,0 +1,112 @@
+from collections import namedtuple
+import numpy as np
+from qzkp.analytic import flip_channels
+from qzkp.stabilizer import StabilizerBackend
+from qzkp.verifier import Verifier, acceptance_threshold, count_matches
+
+
+#----------------------------------------
+# Batched rounds
+#----------------------------------------
+# Per round match counts, prover classes (0 honest, 1 dishonest) and Bob's decisions.
+Rounds = namedtuple('Rounds', ['matches', 'dec', 'accepted', 'threshold'])
+
+ADVERSARIES = (None, 'attack', 'guess')
+# Upper bound on the qubits of one block of rounds, about 16 MB per state array.
+BLOCK_QUBITS = 1 << 24
+
+def _noise_params(noise):
+    if noise is None:
+        return 0.0, 0.0
+    unknown = set(noise) - {'pbit', 'pphase'}
+    if unknown:
+        raise ValueError(f'Only bit-flip/phase-flip noise (pbit, pphase) is supported, got {sorted(unknown)}.')
+    return noise.get('pbit', 0.0), noise.get('pphase', 0.0)
+
+def _honest_matches(backend, a, b, c):
+    rounds = (len(c), len(a))
+    psi = backend.psi_gen(np.broadcast_to(a, rounds), b)
+    psi = backend.challenge_gen(psi, c, b)
+    psi = backend.alice_mod(psi, a, b)
+    c_aprox = b ^ backend.measurements(psi, a)
+    return count_matches(c, c_aprox)
+
+def _attack_matches(backend, a, b, c, rng):
+    '''
+    Eve's intercept-resend: random basis measurement, XOR with a_xor_b and
+    re-encoding in a second random basis, for every round at once.
+    '''
+    rounds = (len(c), len(a))
+    psi = backend.psi_gen(np.broadcast_to(a, rounds), b)
+    psi = backend.challenge_gen(psi, c, b)
+    r = rng.integers(0, 2, size=rounds, dtype=np.uint8)
+    attack_estimation = (a ^ b) ^ backend.measurements(psi, r)
+    r = rng.integers(0, 2, size=rounds, dtype=np.uint8)
+    attack_state = backend.psi_gen(attack_estimation, r)
+    c_aprox = b ^ backend.measurements(attack_state, a)
+    return count_matches(c, c_aprox)
+
+def _adversary_matches(backend, a, b, c, adversary, rng):
+    '''
+    Same for a qzkp.adversary strategy.
+    '''
+    rounds = (len(c), len(a))
+    psi = backend.challenge_gen(backend.psi_gen(np.broadcast_to(a, rounds), b), c, b)
+    c_aprox = b ^ backend.measurements(adversary(backend, psi, a ^ b, rng), a)
+    return count_matches(c, c_aprox)
+
+def run_rounds(a, b, rounds, noise=None, adversary='attack', honest_fraction=0.5, threshold=None, seed=None,
+               block_rounds=None):
+    '''
+    Runs rounds protocol rounds with the fixed secrets a, b as (rounds, N)
+    array computations on the NumPy stabilizer engine, and returns Rounds
+    with (rounds,) arrays of match counts, prover classes and acceptances.
+
+    noise:     None or {'pbit': ..., 'pphase': ...}, injected after the same
+               gates as in QZKP_noise_flip.py.
+    adversary: 'attack' (intercept-resend), 'guess' (random c_aprox), a
+               qzkp.adversary strategy or None for honest rounds only.
+               Otherwise every round is honest with probability
+               honest_fraction, like the scripts' coin.
+    threshold: qzkp.verifier.Threshold of Bob's decision, by default the one
+               minimizing FAR + FRR for these keys and noise.
+
+    Rounds are processed in blocks of block_rounds (by default as many as
+    fit in BLOCK_QUBITS qubits), so memory does not grow with rounds.
+    '''
+    if adversary not in ADVERSARIES and not callable(adversary):
+        raise ValueError(f'Unknown adversary {adversary!r}, expected one of {ADVERSARIES}.')
+    a = np.asarray(a, dtype=np.uint8)
+    b = np.asarray(b, dtype=np.uint8)
+    if a.shape != b.shape or a.ndim != 1:
+        raise ValueError('Keys a and b of the same length expected.')
+    key_length = len(a)
+    pbit, pphase = _noise_params(noise)
+    rng = np.random.default_rng(seed)
+    backend = StabilizerBackend(pbit, pphase, rng)
+    if threshold is None:
+        threshold = acceptance_threshold(key_length, flip_channels(pbit, pphase), adversary != 'guess', a, b)
+    verifier = Verifier(threshold)
+    block_rounds = block_rounds or max(1, BLOCK_QUBITS // max(key_length, 1))
+
+    matches = np.empty(rounds, dtype=np.int64)
+    dec = np.zeros(rounds, dtype=np.uint8)
+    for start in range(0, rounds, block_rounds):
+        stop = min(start + block_rounds, rounds)
+        c = rng.integers(0, 2, size=(stop - start, key_length), dtype=np.uint8)
+        block_dec = dec[start:stop]
+        if adversary is not None:
+            block_dec[:] = rng.random(stop - start) >= honest_fraction
+        block_matches = matches[start:stop]
+        honest = block_dec == 0
+        if honest.any():
+            block_matches[honest] = _honest_matches(backend, a, b, c[honest])
+        if not honest.all():
+            if adversary == 'attack':
+                block_matches[~honest] = _attack_matches(backend, a, b, c[~honest], rng)
+            elif callable(adversary):
+                block_matches[~honest] = _adversary_matches(backend, a, b, c[~honest], adversary, rng)
+            else:
+                guess = rng.integers(0, 2, size=(int((~honest).sum()), key_length), dtype=np.uint8)
+                block_matches[~honest] = count_matches(c[~honest], guess)
+    return Rounds(matches, dec, verifier.record(matches, dec), threshold)
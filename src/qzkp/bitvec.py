@@ -0,0 +1,109 @@
+import numpy as np
+
+
+#----------------------------------------
+# Popcount
+#----------------------------------------
+if hasattr(np, 'bitwise_count'):
+    def popcount(words):
+        return int(np.bitwise_count(words).sum())
+else:
+    _BYTE_COUNTS = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+    def popcount(words):
+        return int(_BYTE_COUNTS[words.view(np.uint8)].sum())
+
+
+#----------------------------------------
+# Bit vectors
+#----------------------------------------
+class BitVector:
+    '''
+    Fixed length bit string packed little endian into uint64 words (bit i is
+    bit i % 64 of word i // 64), so XOR is word wide and counting matches is
+    a popcount. It still indexes and iterates like the lists of 0/1 ints the
+    protocol functions take, and np.asarray() unpacks it into a uint8 array.
+    '''
+    __slots__ = ('words', 'length')
+    # Make numpy defer to __xor__/__rxor__ instead of XOR-ing element by element.
+    __array_ufunc__ = None
+
+    def __init__(self, bits=()):
+        if isinstance(bits, BitVector):
+            self.words, self.length = bits.words.copy(), bits.length
+            return
+        bits = np.asarray(bits, dtype=np.uint8).ravel()
+        self.length = len(bits)
+        packed = np.packbits(bits, bitorder='little')
+        padded = np.zeros(-(-len(packed) // 8) * 8, dtype=np.uint8)
+        padded[:len(packed)] = packed
+        self.words = padded.view('<u8')
+
+    @classmethod
+    def from_words(cls, words, length):
+        vector = cls.__new__(cls)
+        vector.words = words
+        vector.length = length
+        return vector
+
+    def to_bits(self):
+        '''
+        Unpacked uint8 array of 0/1.
+        '''
+        return np.unpackbits(self.words.view(np.uint8), bitorder='little')[:self.length]
+
+    def __array__(self, dtype=None, copy=None):
+        bits = self.to_bits()
+        return bits if dtype is None else bits.astype(dtype)
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return BitVector(self.to_bits()[i])
+        if i < 0:
+            i += self.length
+        if not 0 <= i < self.length:
+            raise IndexError('BitVector index out of range.')
+        return int(self.words[i >> 6] >> np.uint64(i & 63)) & 1
+
+    def __iter__(self):
+        return iter(self.to_bits().tolist())
+
+    def __repr__(self):
+        return f'BitVector({self.to_bits().tolist()})'
+
+    def __eq__(self, other):
+        # Anything but a bit sequence is simply unequal.
+        if not isinstance(other, (BitVector, list, tuple, np.ndarray)):
+            return NotImplemented
+        try:
+            other = as_bitvector(other)
+        except (TypeError, ValueError):
+            return NotImplemented
+        return self.length == other.length and bool(np.array_equal(self.words, other.words))
+
+    def __xor__(self, other):
+        other = as_bitvector(other)
+        if self.length != other.length:
+            raise ValueError('Same number of bits expected.')
+        return BitVector.from_words(self.words ^ other.words, self.length)
+
+    __rxor__ = __xor__
+
+    def count(self):
+        '''
+        Number of ones.
+        '''
+        return popcount(self.words)
+
+    def matches(self, other):
+        '''
+        Number of positions where both vectors hold the same bit. Padding bits
+        are zero in both vectors and never count as a difference.
+        '''
+        return self.length - (self ^ other).count()
+
+def as_bitvector(bits):
+    return bits if isinstance(bits, BitVector) else BitVector(bits)
@@ -0,0 +1,158 @@
+import math
+from collections import namedtuple
+
+
+#----------------------------------------
+# Protocol stages
+#----------------------------------------
+# Points of a round where stage noise acts on every qubit, in protocol order:
+# Bob's prepared challenge, the Bob -> Alice link, Alice's modification, the
+# Alice -> Bob link, and just before a measurement (Bob's, or Eve's).
+STAGES = ('prepare', 'to_prover', 'prover', 'to_verifier', 'measure')
+
+
+#----------------------------------------
+# Channel registry
+#----------------------------------------
+ChannelKind = namedtuple('ChannelKind', ['bloch', 'pauli', 'aer', 'stages'])
+ChannelKind.__doc__ = '''
+A single parameter noise channel. bloch(p) is the map of Bloch vectors
+(x, y, z), pauli(p) the (px, py, pz) probabilities of a Pauli channel or
+None when it is not one, aer(p) the qiskit_aer QuantumError and stages the
+stages it may be attached to.
+'''
+CHANNELS = {}
+
+def register(name, bloch, pauli=None, aer=None, stages=STAGES):
+    CHANNELS[name] = ChannelKind(bloch, pauli, aer, stages)
+
+def _pauli_bloch(px, py, pz):
+    return lambda x, y, z: ((1 - 2*(py + pz))*x, (1 - 2*(px + pz))*y, (1 - 2*(px + py))*z)
+
+def _pauli_aer(px, py, pz):
+    from qiskit_aer.noise import pauli_error
+
+    terms = [(pauli, p) for pauli, p in (('X', px), ('Y', py), ('Z', pz), ('I', 1 - px - py - pz)) if p > 0]
+    return pauli_error(terms)
+
+def _mixing(p):
+    # Replaced by the maximally mixed state with probability p.
+    return (p/4, p/4, p/4)
+
+def _dephasing(lam):
+    # Phase damping is the phase-flip channel with 1 - 2 pz = sqrt(1 - lam).
+    return (0.0, 0.0, (1 - math.sqrt(1 - lam)) / 2)
+
+def _amplitude_damping_bloch(gamma):
+    shrink = math.sqrt(1 - gamma)
+    return lambda x, y, z: (shrink*x, shrink*y, (1 - gamma)*z + gamma)
+
+def _amplitude_damping_aer(gamma):
+    from qiskit_aer.noise import amplitude_damping_error
+
+    return amplitude_damping_error(gamma)
+
+for _name, _pauli in {
+    'bit_flip': lambda p: (p, 0.0, 0.0),
+    'phase_flip': lambda p: (0.0, 0.0, p),
+    'depolarizing': _mixing,
+    'phase_damping': _dephasing,
+    # A lost qubit is detected and Bob counts a random bit for it.
+    'lossy': _mixing,
+}.items():
+    register(_name, lambda p, pauli=_pauli: _pauli_bloch(*pauli(p)), _pauli, lambda p, pauli=_pauli: _pauli_aer(*pauli(p)))
+# A readout error flips the measured bit, i.e. an X just before the measurement.
+register('readout', lambda p: _pauli_bloch(p, 0.0, 0.0), lambda p: (p, 0.0, 0.0), lambda p: _pauli_aer(p, 0.0, 0.0), ('measure',))
+register('amplitude_damping', _amplitude_damping_bloch, None, _amplitude_damping_aer)
+
+
+#----------------------------------------
+# Stage noise
+#----------------------------------------
+def parse_noise(specs):
+    '''
+    {stage: [(kind, p), ...]} from 'stage:kind:p' strings, given as a list
+    or joined by commas, e.g. 'to_prover:lossy:0.1,measure:readout:0.02'.
+    An already parsed dict is returned as is.
+    '''
+    if isinstance(specs, dict):
+        return specs
+    if isinstance(specs, str):
+        specs = [spec for spec in specs.split(',') if spec.strip()]
+    noise = {}
+    for spec in specs:
+        try:
+            stage, kind, p = spec.strip().split(':')
+            p = float(p)
+        except ValueError:
+            raise ValueError(f'Stage noise {spec!r} is not stage:kind:probability.') from None
+        if stage not in STAGES:
+            raise ValueError(f'Unknown stage {stage!r}, expected one of {STAGES}.')
+        if kind not in CHANNELS:
+            raise ValueError(f'Unknown noise channel {kind!r}, expected one of {tuple(CHANNELS)}.')
+        if stage not in CHANNELS[kind].stages:
+            raise ValueError(f'{kind} noise only applies to the {", ".join(CHANNELS[kind].stages)} stage.')
+        if not 0 <= p <= 1:
+            raise ValueError(f'Probability {p} of {spec!r} out of [0, 1].')
+        noise.setdefault(stage, []).append((kind, p))
+    return noise
+
+def format_noise(noise):
+    return ','.join(f'{stage}:{kind}:{p}' for stage in STAGES for kind, p in noise.get(stage, ()))
+
+
+#----------------------------------------
+# Compilation
+#----------------------------------------
+def bloch_channels(noise):
+    '''
+    channels dict of qzkp.analytic with one composed map per stage marker.
+    '''
+    channels = {}
+    for stage, kinds in noise.items():
+        maps = [CHANNELS[kind].bloch(p) for kind, p in kinds]
+        def channel(x, y, z, maps=maps):
+            for bloch in maps:
+                x, y, z = bloch(x, y, z)
+            return (x, y, z)
+        channels[stage] = channel
+    return channels
+
+def combine_channels(channels, other):
+    '''
+    channels dict applying both, channels first where they share a key.
+    '''
+    combined = dict(channels)
+    for key, channel in other.items():
+        if key in combined:
+            first = combined[key]
+            combined[key] = lambda x, y, z, first=first, second=channel: second(*first(x, y, z))
+        else:
+            combined[key] = channel
+    return combined
+
+def pauli_channels(noise):
+    '''
+    {stage: [(px, py, pz), ...]} for the stabilizer engine, which only
+    tracks Pauli channels.
+    '''
+    compiled = {}
+    for stage, kinds in noise.items():
+        for kind, p in kinds:
+            if CHANNELS[kind].pauli is None:
+                raise ValueError(f'{kind} is not a Pauli channel, use the Aer backend or the analytic mode.')
+            compiled.setdefault(stage, []).append(CHANNELS[kind].pauli(p))
+    return compiled
+
+def aer_errors(noise):
+    '''
+    {stage: QuantumError} composing the channels of every stage.
+    '''
+    compiled = {}
+    for stage, kinds in noise.items():
+        error = None
+        for kind, p in kinds:
+            step = CHANNELS[kind].aer(p)
+            error = step if error is None else error.compose(step)
+        compiled[stage] = error
+    return compiled
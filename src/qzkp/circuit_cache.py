@@ -0,0 +1,93 @@
+from collections import OrderedDict
+
+
+#----------------------------------------
+# Qubit recipes
+#----------------------------------------
+class QubitRecipe:
+    '''
+    Stand-in for a QuantumCircuit(1, 1) that only records the gate names.
+    The protocol functions build it exactly like a circuit, and CircuitCache
+    turns it into a shared, ready to run circuit.
+    '''
+    __slots__ = ('gates',)
+
+    def __init__(self):
+        self.gates = []
+
+    def x(self, qubit):
+        self.gates.append('x')
+
+    def z(self, qubit):
+        self.gates.append('z')
+
+    def h(self, qubit):
+        self.gates.append('h')
+
+    def s(self, qubit):
+        self.gates.append('s')
+
+    def sx(self, qubit):
+        self.gates.append('sx')
+
+    def measure(self, qubit, clbit):
+        self.gates.append('measure')
+
+
+#----------------------------------------
+# Circuit cache
+#----------------------------------------
+class CircuitCache:
+    '''
+    Memoizing factory of single qubit circuits keyed by their gate sequence.
+    Every distinct sequence is built (and transpiled for sim when transpiled
+    is set) once and kept in a bounded LRU, so with a handful of variants
+    per round the transpile calls no longer grow with rounds × key_length.
+    Recipe entries found in instructions (e.g. stage noise) are appended as
+    those instructions.
+    '''
+    def __init__(self, sim=None, maxsize=256, transpiled=True, instructions=None):
+        self.sim = sim
+        self.instructions = instructions or {}
+        self.maxsize = maxsize
+        self.transpiled = transpiled
+        self.circuits = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.transpiles = 0
+
+    def build(self, gates):
+        from qiskit import QuantumCircuit, transpile
+
+        circuit = QuantumCircuit(1, 1)
+        for gate in gates:
+            if gate == 'measure':
+                circuit.measure(0, 0)
+            elif gate in self.instructions:
+                circuit.append(self.instructions[gate], [0])
+            else:
+                getattr(circuit, gate)(0)
+        if self.transpiled:
+            circuit = transpile(circuit, self.sim)
+            self.transpiles += 1
+        return circuit
+
+    def circuit(self, recipe):
+        '''
+        Cached circuit for a QubitRecipe. The returned circuit is shared and
+        must not be modified.
+        '''
+        key = tuple(recipe.gates)
+        if key in self.circuits:
+            self.hits += 1
+            self.circuits.move_to_end(key)
+            return self.circuits[key]
+        self.misses += 1
+        circuit = self.build(key)
+        self.circuits[key] = circuit
+        if len(self.circuits) > self.maxsize:
+            self.circuits.popitem(last=False)
+        return circuit
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'transpiles': self.transpiles, 'size': len(self.circuits)}
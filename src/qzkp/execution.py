@@ -0,0 +1,97 @@
+from qzkp.seeding import SEED_BLOCK, next_simulator_seed, simulator_seeds
+
+
+#----------------------------------------
+# Batched execution
+#----------------------------------------
+def chunks(items, size):
+    '''
+    Consecutive slices of at most size elements.
+    '''
+    if size is None or size <= 0:
+        size = len(items)
+    for start in range(0, len(items), max(size, 1)):
+        yield items[start:start + size]
+
+def wide_circuit(circuits):
+    '''
+    Packs single qubit circuits side by side into one circuit, qubit i
+    being measured into clbit i.
+    '''
+    from qiskit import QuantumCircuit
+
+    wide = QuantumCircuit(len(circuits), len(circuits))
+    for i, qubit in enumerate(circuits):
+        wide.compose(qubit, qubits=[i], clbits=[i], inplace=True)
+    return wide
+
+def run_batched(circuits, sim, batch_size=None, wide=False, seeds=None):
+    '''
+    Runs already measured single qubit circuits with one simulator job per
+    batch and returns the measured bit of every circuit, in order.
+
+    By default each batch is submitted as a list of circuits. With wide=True
+    each batch is packed into a single wide circuit instead, which is only
+    tractable for Clifford circuits (ideal or Pauli noise), where Aer picks
+    the stabilizer method.
+
+    seeds, one seed_simulator value per block of SEED_BLOCK circuits (see
+    qzkp.seeding), makes the outcomes independent of batch_size: the jobs
+    are then the blocks, each run with its own seed, instead of the batches.
+    '''
+    if seeds is not None:
+        batch_size = SEED_BLOCK
+    results = []
+    for k, batch in enumerate(chunks(list(circuits), batch_size)):
+        options = {} if seeds is None else {'seed_simulator': seeds[k]}
+        if wide:
+            exec = sim.run(wide_circuit(batch), shots=1, memory=True, **options).result()
+            bits = exec.get_memory(0)[0]
+            # Qiskit bitstrings are little endian: clbit 0 is the last character.
+            results.extend(int(bit) for bit in reversed(bits))
+        else:
+            exec = sim.run(batch, shots=1, memory=True, **options).result()
+            results.extend(int(exec.get_memory(i)[0]) for i in range(len(batch)))
+    return results
+
+
+#----------------------------------------
+# Shot aggregated execution
+#----------------------------------------
+def circuit_key(circuit):
+    '''
+    Hashable description of a circuit's instructions.
+    '''
+    return tuple((inst.operation.name, tuple(inst.operation.params)) for inst in circuit.data)
+
+def run_grouped(circuits, sim, prepare=None, seeds=None):
+    '''
+    Groups identical single qubit circuits, runs each distinct one once with
+    shots equal to the size of its group and scatters the sampled bits back
+    to their positions. Shots are independent, so the outcome distribution
+    is the same as one single shot job per circuit. prepare (e.g. a
+    transpile call) is applied once per distinct circuit. With seeds (one
+    per block of SEED_BLOCK circuits, as for run_batched) the circuits are
+    grouped within each block, the groups of a block running with seeds
+    drawn from the block's.
+    '''
+    if seeds is None:
+        return _run_groups(circuits, sim, prepare)
+    results = []
+    for seed, block in zip(seeds, chunks(list(circuits), SEED_BLOCK)):
+        results.extend(_run_groups(block, sim, prepare, simulator_seeds(seed)))
+    return results
+
+def _run_groups(circuits, sim, prepare, seeds=None):
+    groups = {}
+    for position, circuit in enumerate(circuits):
+        groups.setdefault(circuit_key(circuit), (circuit, []))[1].append(position)
+    results = [0] * len(circuits)
+    for circuit, positions in groups.values():
+        if prepare is not None:
+            circuit = prepare(circuit)
+        options = {} if seeds is None else {'seed_simulator': next_simulator_seed(seeds)}
+        exec = sim.run(circuit, shots=len(positions), memory=True, **options).result()
+        for position, bit in zip(positions, exec.get_memory(0)):
+            results[position] = int(bit)
+    return results
@@ -0,0 +1,89 @@
+import numpy as np
+
+
+#----------------------------------------
+# Bit-flip / phase-flip channel
+#----------------------------------------
+NOISY_GATES = ['x', 'z', 'h']
+
+def flip_error(pbit, pphase):
+    '''
+    Bit-flip with probability pbit followed by phase-flip with probability
+    pphase, the channel QZKP_noise_flip.py injects after a gate.
+    '''
+    from qiskit_aer.noise import pauli_error
+
+    error = pauli_error([('X', pbit), ('I', 1 - pbit)])
+    return error.compose(pauli_error([('Z', pphase), ('I', 1 - pphase)]))
+
+def flip_noise_model(pbit, pphase):
+    '''
+    Noise model applying flip_error after every x, z and h gate. Measurements
+    stay ideal, as in the injection method.
+    '''
+    from qiskit_aer.noise import NoiseModel
+
+    noise_model = NoiseModel()
+    if pbit or pphase:
+        noise_model.add_all_qubit_quantum_error(flip_error(pbit, pphase), NOISY_GATES)
+    return noise_model
+
+class PauliInjector:
+    '''
+    The injection method of QZKP_noise_flip.py: called on a qubit after a
+    gate, it appends X with probability pbit and then Z with probability
+    pphase. Draws from rng, by default the global np.random state.
+    '''
+    def __init__(self, pbit, pphase, rng=None):
+        self.pbit = pbit
+        self.pphase = pphase
+        self.rng = rng if rng is not None else np.random
+
+    def __call__(self, qubit):
+        if self.rng.choice([0, 1], p=[1 - self.pbit, self.pbit]):
+            qubit.x(0)
+        if self.rng.choice([0, 1], p=[1 - self.pphase, self.pphase]):
+            qubit.z(0)
+
+def noiseless_h(qubit):
+    '''
+    Hadamard on qubit 0 that the flip noise model leaves alone: S SX S equals
+    H up to a global phase and stays Clifford, so the stabilizer method still
+    applies. The injection method adds no noise after the H of psi_gen.
+    '''
+    qubit.s(0)
+    qubit.sx(0)
+    qubit.s(0)
+
+
+#----------------------------------------
+# Phase-amplitude damping
+#----------------------------------------
+DAMPED_GATES = ['h', 'measure']
+
+def damping_error(gamma, lam):
+    from qiskit_aer.noise import phase_amplitude_damping_error
+
+    return phase_amplitude_damping_error(gamma, lam)
+
+def damping_noise_model(gamma, lam):
+    '''
+    Noise model of QZKP_noise_damping.py: damping_error(gamma, lam) after
+    every h gate and before every measurement.
+    '''
+    from qiskit_aer.noise import NoiseModel
+
+    noise_model = NoiseModel()
+    noise_model.add_all_qubit_quantum_error(damping_error(gamma, lam), DAMPED_GATES)
+    return noise_model
+
+def damping_circuit_channels(gamma, lam, stages=None):
+    '''
+    qzkp.analytic.CircuitChannels of the damping script's circuits, evolved
+    as density matrices.
+    '''
+    from qiskit_aer import AerSimulator
+    from qzkp.analytic import CircuitChannels
+
+    sim = AerSimulator(method='density_matrix', noise_model=damping_noise_model(gamma, lam))
+    return CircuitChannels(sim, damping_error(gamma, lam), stages=stages)
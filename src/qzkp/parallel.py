@@ -0,0 +1,54 @@
+import multiprocessing as mp
+import os
+import time
+import numpy as np
+
+
+#----------------------------------------
+# Worker side
+#----------------------------------------
+_round = None
+
+def _init_worker(seeds, round_fn, init, init_args):
+    '''
+    Takes this worker's seed and builds its simulator and random streams.
+    '''
+    global _round
+    _round = round_fn
+    seed_seq = seeds.get()
+    if init is not None:
+        init(seed_seq, *init_args)
+
+def _run_round(iteration):
+    start = time.perf_counter()
+    result = _round(iteration)
+    return iteration, result, time.perf_counter() - start
+
+
+#----------------------------------------
+# Parent side
+#----------------------------------------
+def _pool(workers, round_fn, init, init_args, seed):
+    ctx = mp.get_context()
+    seeds = ctx.Queue()
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    for child in seed.spawn(workers):
+        seeds.put(child)
+    return ctx.Pool(workers, _init_worker, (seeds, round_fn, init, init_args))
+
+def iter_parallel(round_fn, num_iter, workers=None, init=None, init_args=(), seed=None):
+    '''
+    Runs round_fn(i) for i in range(num_iter) on a pool of worker processes
+    and yields (iteration, result, seconds) in iteration order as they
+    complete, so the caller can stream them to disk.
+
+    Every worker calls init(seed_sequence, *init_args) once with its own
+    child of the seed SeedSequence (or SeedSequence(seed)), so each process
+    owns its simulator and an independent random stream.
+    '''
+    workers = workers or os.cpu_count()
+    # Capped so a slow chunk does not hold back the rounds ordered after it for long.
+    chunksize = max(1, min(num_iter // (workers * 16), 1000))
+    with _pool(workers, round_fn, init, init_args, seed) as pool:
+        yield from pool.imap(_run_round, range(num_iter), chunksize)
@@ -0,0 +1,138 @@
+import json
+import os
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+
+
+# Shared no-op context returned by disabled profilers, entering it costs no allocation.
+_DISABLED = nullcontext()
+
+
+#----------------------------------------
+# Stages
+#----------------------------------------
+class _Stage:
+    __slots__ = ('profiler', 'name', 'iteration', 'start')
+
+    def __init__(self, profiler, name, iteration):
+        self.profiler = profiler
+        self.name = name
+        self.iteration = iteration
+
+    def __enter__(self):
+        profiler = self.profiler
+        profiler.stack.append(self.name)
+        if self.iteration is not None:
+            profiler.iteration = self.iteration
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        self.profiler.record(self.name, self.start, end)
+        if self.iteration is not None:
+            self.profiler.iteration = None
+        return False
+
+
+#----------------------------------------
+# Profiler
+#----------------------------------------
+class Profiler:
+    '''
+    Opt-in wall time, call count and simulator job count of the protocol
+    stages. Stages nest, e.g. round/bob_measure/job, and are aggregated by
+    their full path. A disabled profiler hands out a shared no-op context
+    and leaves the simulators untouched, so the instrumented code costs one
+    attribute check per stage.
+    '''
+    def __init__(self, enabled=True, trace=False):
+        self.enabled = enabled
+        self.trace = trace
+        self.stack = []
+        self.iteration = None
+        self.totals = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.jobs = defaultdict(int)
+        self.iterations = defaultdict(lambda: defaultdict(float))
+        self.events = []
+        self.origin = time.perf_counter()
+
+    def stage(self, name, iteration=None):
+        '''
+        Context timing one stage. Passing iteration marks the per round stage
+        the nested ones are attributed to.
+        '''
+        if not self.enabled:
+            return _DISABLED
+        return _Stage(self, name, iteration)
+
+    def record(self, name, start, end):
+        path = '/'.join(self.stack)
+        self.stack.pop()
+        elapsed = end - start
+        self.totals[path] += elapsed
+        self.calls[path] += 1
+        if self.iteration is not None:
+            self.iterations[self.iteration][path] += elapsed
+        if self.trace:
+            self.events.append({'name': name, 'cat': path, 'ph': 'X', 'pid': os.getpid(), 'tid': 0,
+                                'ts': (start - self.origin) * 1e6, 'dur': elapsed * 1e6,
+                                'args': {'iteration': self.iteration}})
+
+    def instrument(self, sim):
+        '''
+        Counts the jobs submitted to sim against the innermost open stage.
+        Returns sim, unchanged when the profiler is disabled.
+        '''
+        if not self.enabled:
+            return sim
+        run = sim.run
+
+        def counted_run(*args, **kwargs):
+            self.jobs['/'.join(self.stack)] += 1
+            return run(*args, **kwargs)
+
+        sim.run = counted_run
+        return sim
+
+    #----------------------------------------
+    # Output
+    #----------------------------------------
+    def report(self):
+        '''
+        {path: {'calls', 'total', 'mean', 'jobs'}} with times in seconds and
+        the jobs of nested stages included in their parents.
+        '''
+        report = {}
+        for path in sorted(self.totals):
+            jobs = sum(count for job_path, count in self.jobs.items()
+                       if job_path == path or job_path.startswith(path + '/'))
+            report[path] = {'calls': self.calls[path], 'total': self.totals[path],
+                            'mean': self.totals[path] / self.calls[path], 'jobs': jobs}
+        if self.jobs.get(''):
+            report['(outside stages)'] = {'calls': 0, 'total': 0.0, 'mean': 0.0, 'jobs': self.jobs['']}
+        return report
+
+    def format_report(self):
+        lines = [f'{"stage":<40} {"calls":>9} {"total s":>10} {"mean ms":>10} {"jobs":>9}']
+        for path, row in self.report().items():
+            lines.append(f'{path:<40} {row["calls"]:>9} {row["total"]:>10.3f} {row["mean"] * 1e3:>10.3f} {row["jobs"]:>9}')
+        return '\n'.join(lines)
+
+    def write_json(self, path):
+        '''
+        Aggregated report plus the time of every stage in every round.
+        '''
+        iterations = {str(iteration): dict(stages) for iteration, stages in sorted(self.iterations.items())}
+        with open(path, 'w') as f:
+            json.dump({'stages': self.report(), 'iterations': iterations}, f, indent=1)
+
+    def write_trace(self, path):
+        '''
+        Chrome trace event file, viewable in chrome://tracing or Perfetto.
+        Needs trace=True.
+        '''
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': self.events, 'displayTimeUnit': 'ms'}, f)
@@ -0,0 +1,317 @@
+import time
+import numpy as np
+from qzkp.bitvec import BitVector, as_bitvector
+from qzkp.channels import aer_errors, parse_noise
+from qzkp.circuit_cache import CircuitCache, QubitRecipe
+from qzkp.execution import run_batched, run_grouped
+from qzkp.profiling import Profiler
+from qzkp.seeding import SEED_BLOCK, child, next_simulator_seed, simulator_seeds
+
+
+#----------------------------------------
+# Classical steps
+#----------------------------------------
+def c_aprox_gen(results, p, a):
+    '''
+    Generation of the approximation c' for c.
+    '''
+    c_aprox = []
+    for i, bit in enumerate(results):
+        # if bit == a[i] gamma[i]; else !gamma[i]
+        decission = int(p[i] ^ (bit != a[i]))
+        c_aprox.append(decission)
+    return c_aprox
+
+def equal_entries_percentage(list1, list2):
+    '''
+    Percentage of equal entries.
+    '''
+    if len(list1) != len(list2):
+        raise ValueError("The lists must have the same length.")
+    if isinstance(list1, BitVector) and isinstance(list2, BitVector):
+        return (list1.matches(list2) / len(list1)) * 100
+    equals = 0
+    for (a, b) in zip(list1, list2):
+        equals += int(a == b)
+    return (equals / len(list1)) * 100
+
+def loading_bar(iteration, total, start_time, prefix='Progress:', length=50, fill='█', print_end='\r'):
+    """
+    Progress bar.
+    """
+    percent = 100 * (iteration / total)
+    filled_length = int(length * iteration // total)
+    bar = fill * filled_length + '-' * (length - filled_length)
+    elapsed_time = time.time() - start_time
+    print(f'\r{prefix} |{bar}| {percent:.1f}% Elapsed: {elapsed_time:.1f}s', end=print_end)
+    if iteration == total:
+        print()
+
+
+#----------------------------------------
+# Circuit protocol
+#----------------------------------------
+class CircuitProtocol:
+    '''
+    The circuit protocol functions of the scripts, one QuantumCircuit(1, 1)
+    per qubit, bound to an explicit simulator instead of module globals.
+
+    cache_size:  keep up to this many distinct circuits in a CircuitCache.
+    batch_size, grouped, wide: execution mode of measurements(), see
+                 qzkp.execution. wide with batch_size 0 packs the whole
+                 measurement into one circuit.
+    transpiled:  transpile the circuits for sim before running them.
+    inject:      called on a qubit after every x, z and h gate except the
+                 Hadamard of psi_gen, e.g. qzkp.noise.PauliInjector.
+    prep_h:      replaces the Hadamard of psi_gen, e.g. qzkp.noise.noiseless_h.
+    stages:      qzkp.channels stage noise, appended to the circuits as Aer
+                 error instructions.
+
+    The method signatures match qzkp.stabilizer.StabilizerBackend, so the
+    round functions below run on either.
+    '''
+    def __init__(self, sim, cache_size=0, batch_size=0, grouped=False, wide=False, transpiled=False,
+                 inject=None, prep_h=None, profiler=None, stages=None):
+        self.sim = sim
+        self.errors = {stage: error.to_instruction() for stage, error in aer_errors(parse_noise(stages or {})).items()}
+        instructions = {f'noise:{stage}': instruction for stage, instruction in self.errors.items()}
+        self.cache = CircuitCache(sim, cache_size, transpiled, instructions) if cache_size else None
+        self.batch_size = batch_size
+        self.grouped = grouped
+        self.wide = wide
+        self.transpiled = transpiled
+        self.inject = inject
+        self.prep_h = prep_h
+        self.profiler = profiler if profiler is not None else Profiler(enabled=False)
+        self.sim_seeds = None
+
+    def reseed(self, seed):
+        '''
+        Seeds the simulator jobs and the noise injection (when inject has
+        an rng) from seed. Every measurements() call then draws one
+        seed_simulator value per block of SEED_BLOCK qubits and runs the
+        blocks as its jobs, so the outcomes do not depend on batch_size.
+        '''
+        self.sim_seeds = simulator_seeds(child(seed, 0))
+        if hasattr(self.inject, 'rng'):
+            self.inject.rng = np.random.default_rng(child(seed, 1))
+
+    def qubit(self):
+        if self.cache:
+            return QubitRecipe()
+        from qiskit import QuantumCircuit
+
+        return QuantumCircuit(1, 1)
+
+    def gate(self, qubit, name):
+        getattr(qubit, name)(0)
+        if self.inject is not None:
+            self.inject(qubit)
+
+    def noise(self, psi, *stages):
+        '''
+        Appends the errors of the given protocol stages to every qubit.
+        '''
+        for stage in stages:
+            if stage in self.errors:
+                for qubit in psi:
+                    if isinstance(qubit, QubitRecipe):
+                        qubit.gates.append(f'noise:{stage}')
+                    else:
+                        qubit.append(self.errors[stage], [0])
+        return psi
+
+    def psi_gen(self, a, b):
+        '''
+        Generation of the quantum state |psi>.
+        '''
+        if len(a) != len(b):
+            raise ValueError('Same number of b and bits expected.')
+        psi = []
+        for i in range(len(a)):
+            qubit = self.qubit()
+            if a[i] == 1:
+                self.gate(qubit, 'x')
+            if b[i] == 1:
+                if self.prep_h is not None:
+                    self.prep_h(qubit)
+                else:
+                    qubit.h(0)
+            psi.append(qubit)
+        return psi
+
+    def challenge_gen(self, psi, c, b):
+        '''
+        Generation of the challenge for |psi>.
+        '''
+        if len(psi) != len(c):
+            raise ValueError('Same number of qubits and bits expected.')
+        for i in range(len(psi)):
+            if c[i] == 1:
+                if b[i]==0:
+                    self.gate(psi[i], 'x')
+                else:
+                    self.gate(psi[i], 'z')
+        return psi
+
+    def alice_mod(self, psi, a, b):
+        if len(psi) != len(a) or len(psi) != len(b):
+            raise ValueError('Same number of qubits and bits expected.')
+        a_xor_b = as_bitvector(a) ^ b
+        for i in range(len(psi)):
+            if b[i] == 1:
+                self.gate(psi[i], 'z')
+            if a_xor_b[i] == 1:
+                self.gate(psi[i], 'h')
+            if a[i] == 1:
+                self.gate(psi[i], 'z')
+        return psi
+
+    def zk_mod(self, psi, p):
+        '''
+        Alice Zero-Knowledge momdifications to the state |psi>.
+        '''
+        if len(psi) != len(p):
+            raise ValueError('Same number of qubits and bits expected.')
+        for i in range(len(psi)):
+            if p[i] == 1:
+                psi[i].h(0)
+        return psi
+
+    def measurements(self, psi, b):
+        '''
+        Alice measures using the secret b.
+        '''
+        if len(psi) != len(b):
+            raise ValueError('Same number of qubits and b expected.')
+        sim, cache, profiler = self.sim, self.cache, self.profiler
+        seeds = None
+        if self.sim_seeds is not None:
+            seeds = next_simulator_seed(self.sim_seeds, -(-len(psi) // SEED_BLOCK))
+        # Cached circuits are transpiled by the cache.
+        transpiled = self.transpiled and not cache
+        if transpiled:
+            from qiskit import transpile
+        results = []
+        for i in range(len(psi)):
+            if b[i] == 1:
+                self.gate(psi[i], 'h')
+            self.noise(psi[i:i + 1], 'measure')
+            psi[i].measure(0, 0)
+            if cache:
+                psi[i] = cache.circuit(psi[i])
+            if not self.batch_size and not self.grouped and not self.wide and seeds is None:
+                if transpiled:
+                    with profiler.stage('transpile'):
+                        psi[i] = transpile(psi[i], sim)
+                with profiler.stage('job'):
+                    exec = sim.run(psi[i], shots=1).result()
+                with profiler.stage('parse'):
+                    result = int(list(exec.get_counts(psi[i]).keys())[0])
+                results.append(result)
+        if self.grouped:
+            with profiler.stage('job'):
+                results = run_grouped(psi, sim, (lambda qubit: transpile(qubit, sim)) if transpiled else None, seeds)
+        elif self.batch_size or self.wide or seeds is not None:
+            if transpiled:
+                with profiler.stage('transpile'):
+                    psi = transpile(psi, sim)
+            with profiler.stage('job'):
+                results = run_batched(psi, sim, self.batch_size, self.wide, seeds)
+        return results
+
+
+#----------------------------------------
+# Rounds
+#----------------------------------------
+_DISABLED = Profiler(enabled=False)
+
+def run_protocol_round(engine, rand, a, b, attack=True, profiler=_DISABLED):
+    '''
+    One round against a randomly chosen honest (0) or dishonest (1) prover
+    on a CircuitProtocol or StabilizerBackend, returns (equal_percentage,
+    dec). The dishonest prover runs the intercept-resend attack, or guesses
+    c when attack is False.
+    '''
+    key_length = len(a)
+    dec = int(rand.bits(1)[0])
+    # 1. Keys generation (this keys could be shared through QKD)
+
+    # 2. Preparation of the challenge (Bob)
+    with profiler.stage('challenge_prep'):
+        psi = engine.psi_gen(a, b) # |psi> state generation from a and b
+
+        c = BitVector(rand.bits(key_length)) # Random generation for c
+        challenge_state = engine.challenge_gen(psi, c, b) # Challenge setup
+
+    # After this, Bob sends the modified qubits to Alice
+    challenge_state = engine.noise(challenge_state, 'prepare', 'to_prover')
+
+    if dec == 0:
+        # Honest prover Alice
+
+        # 3.  Alice modification's
+        with profiler.stage('prover_mod'):
+            proof_state = engine.alice_mod(challenge_state, a, b)
+
+        # Alice send the proof state to Bob.
+        proof_state = engine.noise(proof_state, 'prover', 'to_verifier')
+
+        # 6. Bob retrieves c.
+        with profiler.stage('bob_measure'):
+            b_xor_c = engine.measurements(proof_state, a)
+            c_aprox = b ^ BitVector(b_xor_c)
+            equal_percentage = equal_entries_percentage(c, c_aprox)
+
+    else:
+        if attack == True:
+            with profiler.stage('eve_intercept'):
+                attack_state = intercept_resend(engine, rand, challenge_state, as_bitvector(a) ^ b)
+            # 5. Eve sends the attack state to Bob and he measures and count matches
+            with profiler.stage('bob_measure'):
+                results = engine.measurements(attack_state, a)
+                c_aprox = b ^ BitVector(results)
+                equal_percentage = equal_entries_percentage(c, c_aprox)
+        else:
+            # Dishonest prover Eve
+            with profiler.stage('eve_intercept'):
+                c_aprox = BitVector(rand.bits(key_length))
+            with profiler.stage('bob_measure'):
+                equal_percentage = equal_entries_percentage(c, c_aprox)
+    return (equal_percentage, dec)
+
+def run_attack_round(engine, rand, a, b, profiler=_DISABLED):
+    '''
+    One intercept-resend round by Eve, returns the percentage of matches.
+    '''
+    key_length = len(a)
+    # 2. Preparation of the challenge (Bob)
+    with profiler.stage('challenge_prep'):
+        psi = engine.psi_gen(a, b) # |psi> state generation from a and b
+
+        c = BitVector(rand.bits(key_length)) # Random generation for c
+        challenge_state = engine.challenge_gen(psi, c, b) # Challenge setup
+    challenge_state = engine.noise(challenge_state, 'prepare', 'to_prover')
+
+    with profiler.stage('eve_intercept'):
+        attack_state = intercept_resend(engine, rand, challenge_state, as_bitvector(a) ^ b)
+
+    # 5. Eve sends the attack state to Bob and he measures and count matches
+    with profiler.stage('bob_measure'):
+        results = engine.measurements(attack_state, a)
+        c_aprox = b ^ BitVector(results)
+        return equal_entries_percentage(c, c_aprox)
+
+def intercept_resend(engine, rand, challenge_state, a_xor_b):
+    '''
+    Eve's attack state for an intercepted challenge state.
+    '''
+    key_length = len(a_xor_b)
+    # 3. Eve (which has access to a XOR b) meassures the challenge state randomly and generates the attakc estimation
+    r = rand.bits(key_length)
+    measure_results = engine.measurements(challenge_state, r)
+    attack_estimation = a_xor_b ^ BitVector(measure_results)
+
+    # 4. Eve generates the attack state encoding the attack estimaiton with ranodm bassis
+    r = rand.bits(key_length)
+    return engine.noise(engine.psi_gen(attack_estimation, r), 'to_verifier')
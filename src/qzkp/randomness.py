@@ -0,0 +1,56 @@
+import os
+import numpy as np
+from qzkp.seeding import next_simulator_seed
+
+
+#----------------------------------------
+# Random bit sources
+#----------------------------------------
+MODES = ('quantum', 'numpy', 'os')
+
+class RandomSource:
+    '''
+    Bulk random bits for keys, challenges and bases.
+
+    quantum: one Hadamard-measure circuit run with shots=length on sim.
+    numpy:   numpy Generator, reproducible when a seed is given.
+    os:      operating system entropy (os.urandom).
+    '''
+    def __init__(self, mode='quantum', sim=None, seed=None):
+        if mode not in MODES:
+            raise ValueError(f'Unknown randomness mode {mode!r}, expected one of {MODES}.')
+        if mode == 'quantum' and sim is None:
+            raise ValueError('Quantum randomness needs a simulator.')
+        self.mode = mode
+        self.sim = sim
+        self.rng = np.random.default_rng(seed)
+        self.coin = None
+
+    def _quantum_bits(self, length):
+        if self.coin is None:
+            from qiskit import QuantumCircuit
+            self.coin = QuantumCircuit(1, 1)
+            self.coin.h(0)
+            self.coin.measure(0, 0)
+        exec = self.sim.run(self.coin, shots=length, memory=True, seed_simulator=next_simulator_seed(self.rng)).result()
+        memory = ''.join(exec.get_memory(0)).encode()
+        return np.frombuffer(memory, dtype=np.uint8) - ord('0')
+
+    def reseed(self, seed):
+        self.rng = np.random.default_rng(seed)
+
+    def bits(self, length, packed=False):
+        '''
+        Array of length random bits, one uint8 per bit, or np.packbits
+        of them (8 bits per byte) when packed is set.
+        '''
+        if length == 0:
+            bits = np.zeros(0, dtype=np.uint8)
+        elif self.mode == 'quantum':
+            bits = self._quantum_bits(length)
+        elif self.mode == 'numpy':
+            bits = self.rng.integers(0, 2, size=length, dtype=np.uint8)
+        else:
+            raw = np.frombuffer(os.urandom((length + 7) // 8), dtype=np.uint8)
+            bits = np.unpackbits(raw)[:length]
+        return np.packbits(bits) if packed else bits
@@ -0,0 +1,183 @@
+import csv
+import importlib.util
+import os
+
+
+#----------------------------------------
+# Columns
+#----------------------------------------
+FORMATS = ('csv', 'parquet')
+# Optional per round columns and their names in the output.
+EXTRA_COLUMNS = {'matches': 'Matches', 'time': 'Seconds', 'accept': 'Accepted', 'seed': 'Seed'}
+
+def result_columns(decision=True, extra=()):
+    columns = ['Iteration', 'Decision', 'Percentages'] if decision else ['Iteration', 'Percentages']
+    return columns + [EXTRA_COLUMNS[name] for name in extra]
+
+def result_row(iteration, percentage, dec=None, key_length=None, seconds=None, extra=(), accepted=None, seed=None):
+    '''
+    Output row of round iteration (0 based, stored 1 based like the CSVs
+    always were). Matches are recovered exactly from the percentage.
+    accepted is Bob's decision, see qzkp.verifier, and seed the round's
+    qzkp.seeding.round_seed (None leaves the column empty).
+    '''
+    row = [iteration + 1, percentage] if dec is None else [iteration + 1, dec, percentage]
+    for name in extra:
+        if name == 'matches':
+            row.append(round(percentage * key_length / 100))
+        elif name == 'time':
+            row.append(seconds)
+        elif name == 'accept':
+            row.append(int(accepted))
+        elif name == 'seed':
+            row.append(seed)
+    return row
+
+
+#----------------------------------------
+# Streaming writer
+#----------------------------------------
+class ResultWriter:
+    '''
+    Appends result rows to disk in buffered chunks, so memory stays constant
+    in the number of rounds and a crash only loses the unflushed buffer.
+
+    csv:     one file, flushed (and fsynced) every buffer_size rows.
+    parquet: a directory of part-NNNNN.parquet files, one per chunk, which
+             pandas.read_parquet and read_results load as one table. Needs
+             pyarrow.
+    '''
+    def __init__(self, path, columns, format='csv', buffer_size=10000):
+        if format not in FORMATS:
+            raise ValueError(f'Unknown result format {format!r}, expected one of {FORMATS}.')
+        self.path = path
+        self.columns = list(columns)
+        self.format = format
+        self.buffer_size = max(1, buffer_size)
+        self.rows = []
+        self.written = 0
+        self.parts = 0
+        if format == 'csv':
+            self.file = open(path, 'w', newline='')
+            self.csv = csv.writer(self.file, lineterminator='\n')
+            self.csv.writerow(self.columns)
+            self.file.flush()
+        else:
+            _require_pyarrow()
+            os.makedirs(path, exist_ok=True)
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def write(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.buffer_size:
+            self.flush()
+
+    def write_many(self, rows):
+        for row in rows:
+            self.write(row)
+
+    def flush(self):
+        if not self.rows:
+            return
+        if self.format == 'csv':
+            self.csv.writerows(self.rows)
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        else:
+            import pandas as pd
+
+            name = f'part-{self.parts:05d}.parquet'
+            # Hidden while being written, so pyarrow datasets skip it too.
+            tmp = os.path.join(self.path, f'.{name}.tmp')
+            pd.DataFrame(self.rows, columns=self.columns).to_parquet(tmp, index=False)
+            os.replace(tmp, os.path.join(self.path, name))
+            self.parts += 1
+        self.written += len(self.rows)
+        self.rows = []
+
+    def close(self):
+        self.flush()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+def _require_pyarrow():
+    if importlib.util.find_spec('pyarrow') is None:
+        raise ImportError('Parquet results need pyarrow (pip install pyarrow).')
+
+
+#----------------------------------------
+# Reader
+#----------------------------------------
+class _CompleteLines:
+    '''
+    Read-only view of a file up to its last newline, hiding a row cut by a
+    crash in the middle of a write.
+    '''
+    def __init__(self, file, end):
+        self.file = file
+        self.remaining = end
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def __iter__(self):
+        while self.remaining:
+            line = self.file.readline(self.remaining)
+            self.remaining -= len(line)
+            yield line
+
+def _last_newline(file, block=1 << 16):
+    end = file.seek(0, os.SEEK_END)
+    while end > 0:
+        start = max(0, end - block)
+        file.seek(start)
+        chunk = file.read(end - start)
+        position = chunk.rfind(b'\n')
+        if position >= 0:
+            return start + position + 1
+        end = start
+    return 0
+
+def read_results(path, chunksize=None):
+    '''
+    DataFrame of a ResultWriter output, including one that is still being
+    written or whose run crashed: a truncated last CSV row and unfinished
+    parquet parts are skipped. With chunksize an iterator of DataFrames is
+    returned instead (one per part for parquet).
+    '''
+    import pandas as pd
+
+    if os.path.isdir(path):
+        parts = sorted(os.path.join(path, name) for name in os.listdir(path)
+                       if name.startswith('part-') and name.endswith('.parquet'))
+        if chunksize is not None:
+            return (pd.read_parquet(part) for part in parts)
+        if not parts:
+            return pd.DataFrame()
+        return pd.concat([pd.read_parquet(part) for part in parts], ignore_index=True)
+    if chunksize is not None:
+        return _read_csv_chunks(path, chunksize)
+    with open(path, 'rb') as f:
+        end = _last_newline(f)
+        f.seek(0)
+        return pd.read_csv(_CompleteLines(f, end))
+
+def _read_csv_chunks(path, chunksize):
+    import pandas as pd
+
+    with open(path, 'rb') as f:
+        end = _last_newline(f)
+        f.seek(0)
+        yield from pd.read_csv(_CompleteLines(f, end), chunksize=chunksize)
@@ -0,0 +1,60 @@
+import numpy as np
+
+
+#----------------------------------------
+# Seed hierarchy
+#----------------------------------------
+# run seed -> keys / rounds -> round i -> one stream per random source of the
+# round (RandomSource, engine), each engine splitting its own further, e.g.
+# CircuitProtocol into Aer seed_simulator values and the noise injection.
+
+# Qubits per seeded Aer job. Aer derives the seeds of the circuits of a list
+# job from the job seed in its own way, so seeded measurements run as fixed
+# blocks of qubits, one job and one seed_simulator value each, whatever the
+# batch size.
+SEED_BLOCK = 256
+
+def child(seed, *path):
+    '''
+    SeedSequence at path below seed. Unlike SeedSequence.spawn it does not
+    depend on how many children were spawned before, so round i gets the
+    same seed in whichever process or chunk it runs.
+    '''
+    return np.random.SeedSequence(seed.entropy, spawn_key=(*seed.spawn_key, *path), pool_size=seed.pool_size)
+
+def simulator_seeds(seed):
+    '''
+    Generator of Aer seed_simulator values.
+    '''
+    return np.random.default_rng(seed)
+
+def next_simulator_seed(rng, count=None):
+    '''
+    One seed_simulator value, or a list of count of them.
+    '''
+    if count is None:
+        return int(rng.integers(0, 1 << 62))
+    return rng.integers(0, 1 << 62, size=count).tolist()
+
+def round_seed(seed, iteration):
+    '''
+    64 bit seed of round iteration below the rounds seed, the value of the
+    results' seed column.
+    '''
+    return int(child(seed, iteration).generate_state(1, np.uint64)[0])
+
+def replay(seed, *sources):
+    '''
+    Reseeds the random sources (anything with a reseed(seed) method) of a
+    round from its round_seed, one independent stream per source.
+    '''
+    for stream, source in enumerate(sources):
+        source.reseed(np.random.SeedSequence(seed, spawn_key=(stream,)))
+
+def reseed(seed, iteration, *sources):
+    '''
+    Reseeds the random sources of round iteration from the rounds seed, so
+    the round draws the same numbers regardless of the worker, chunk or
+    rounds run before it.
+    '''
+    replay(round_seed(seed, iteration), *sources)
@@ -0,0 +1,248 @@
+import argparse
+import asyncio
+import itertools
+import os
+import struct
+import tempfile
+import time
+import numpy as np
+from qzkp.analytic import flip_channels
+from qzkp.bitvec import BitVector
+from qzkp.protocol import intercept_resend
+from qzkp.randomness import RandomSource
+from qzkp.stabilizer import StabilizerBackend
+from qzkp.verifier import Verifier, acceptance_threshold
+from qzkp.wire import decode, encode_qubits, to_qubits
+
+
+#----------------------------------------
+# Quantum channel stand-in
+#----------------------------------------
+class QueueChannel:
+    '''
+    One way in-process channel carrying (session, state) messages. A full
+    queue suspends the sender, which is the back-pressure between the two
+    services.
+    '''
+    def __init__(self, maxsize=64):
+        self.queue = asyncio.Queue(maxsize)
+
+    async def send(self, message):
+        await self.queue.put(message)
+
+    async def receive(self):
+        return await self.queue.get()
+
+    async def close(self):
+        await self.queue.put(None)
+
+# Frame of a state on a socket: message length (0 closes), session id.
+FRAME = struct.Struct('<IQ')
+
+class SocketChannel:
+    '''
+    Both directions of a stream connection (e.g. a Unix socket), carrying
+    QubitArray states in the qzkp.wire format. A send waits until the socket
+    buffer drains. Received states draw their noise from rng.
+    '''
+    def __init__(self, reader, writer, rng=None):
+        self.reader = reader
+        self.writer = writer
+        self.rng = rng
+        self.sent = 0
+
+    async def send(self, message):
+        session, state = message
+        data = encode_qubits(state)
+        self.writer.write(FRAME.pack(len(data), session) + data)
+        self.sent += FRAME.size + len(data)
+        await self.writer.drain()
+
+    async def receive(self):
+        length, session = FRAME.unpack(await self.reader.readexactly(FRAME.size))
+        if length == 0:
+            return None
+        return session, to_qubits(decode(await self.reader.readexactly(length)), self.rng)
+
+    async def close(self):
+        self.writer.write(FRAME.pack(0, 0))
+        await self.writer.drain()
+
+
+#----------------------------------------
+# Prover (Alice)
+#----------------------------------------
+class ProverService:
+    '''
+    Answers every challenge state received on inbox with a proof state on
+    outbox. An honest prover applies alice_mod with the secrets a, b, a
+    dishonest one (attack=True) only knows a ^ b and runs intercept-resend.
+    '''
+    def __init__(self, engine, a, b, inbox, outbox, attack=False, seed=None):
+        self.engine = engine
+        self.a = a
+        self.b = b
+        self.a_xor_b = a ^ b
+        self.inbox = inbox
+        self.outbox = outbox
+        self.attack = attack
+        self.rand = RandomSource('numpy', seed=seed)
+
+    def proof(self, state):
+        if self.attack:
+            return intercept_resend(self.engine, self.rand, state, self.a_xor_b)
+        return self.engine.alice_mod(state, self.a, self.b)
+
+    async def serve(self):
+        while True:
+            message = await self.inbox.receive()
+            if message is None:
+                await self.outbox.close()
+                return
+            session, state = message
+            await self.outbox.send((session, self.proof(state)))
+
+
+#----------------------------------------
+# Verifier (Bob)
+#----------------------------------------
+class VerifierService:
+    '''
+    Runs proof sessions against a prover: prepares the challenge state, sends
+    it on outbox, and measures and decides on the proof state coming back on
+    inbox. Sessions share the channels and are matched by id, at most
+    max_sessions of them are in flight at once.
+    '''
+    def __init__(self, engine, a, b, outbox, inbox, threshold, max_sessions=64, seed=None):
+        self.engine = engine
+        self.a = a
+        self.b = b
+        self.outbox = outbox
+        self.inbox = inbox
+        self.verifier = Verifier(threshold)
+        self.slots = asyncio.Semaphore(max_sessions)
+        self.rand = RandomSource('numpy', seed=seed)
+        self.ids = itertools.count()
+        self.pending = {}
+
+    async def receive(self):
+        '''
+        Hands every proof state to the session waiting for it.
+        '''
+        while True:
+            message = await self.inbox.receive()
+            if message is None:
+                return
+            session, state = message
+            self.pending.pop(session).set_result(state)
+
+    async def prove(self, dec=0):
+        '''
+        One proof session, returns (matches, accepted, latency in seconds)
+        measured from the request, including the wait for a free slot. dec is
+        the prover class the decision is tallied under, as in Verifier.record.
+        '''
+        start = time.perf_counter()
+        async with self.slots:
+            session = next(self.ids)
+            c = BitVector(self.rand.bits(len(self.a)))
+            state = self.engine.challenge_gen(self.engine.psi_gen(self.a, self.b), c, self.b)
+            proof = asyncio.get_running_loop().create_future()
+            self.pending[session] = proof
+            await self.outbox.send((session, state))
+            results = self.engine.measurements(await proof, self.a)
+            matches = c.matches(self.b ^ BitVector(results))
+        accepted = bool(self.verifier.record(matches, dec))
+        return matches, accepted, time.perf_counter() - start
+
+
+#----------------------------------------
+# Load test
+#----------------------------------------
+async def socket_pair(path, prover_rng=None, verifier_rng=None):
+    '''
+    Prover and verifier ends of a Unix socket connection at path, and the
+    server to close once done.
+    '''
+    accepted = asyncio.get_running_loop().create_future()
+    server = await asyncio.start_unix_server(lambda reader, writer: accepted.set_result((reader, writer)), path)
+    prover = SocketChannel(*await asyncio.open_unix_connection(path), prover_rng)
+    return prover, SocketChannel(*await accepted, verifier_rng), server
+
+TRANSPORTS = ('queue', 'unix')
+
+async def run_load(sessions, key_length=256, max_sessions=64, channel_size=64, pbit=0.0, pphase=0.0,
+                   attack=False, seed=None, transport='queue'):
+    '''
+    Runs sessions concurrent proofs between one verifier and one prover on
+    the NumPy stabilizer engine, over in-process queues or a Unix socket,
+    and returns the throughput, the latency percentiles and the acceptance
+    rate.
+    '''
+    if transport not in TRANSPORTS:
+        raise ValueError(f'Unknown transport {transport!r}, expected one of {TRANSPORTS}.')
+    seeds = np.random.SeedSequence(seed).spawn(5)
+    keys = np.random.default_rng(seeds[0]).integers(0, 2, size=(2, key_length))
+    a, b = BitVector(keys[0]), BitVector(keys[1])
+    prover_engine = StabilizerBackend(pbit, pphase, seeds[1])
+    verifier_engine = StabilizerBackend(pbit, pphase, seeds[3])
+
+    with tempfile.TemporaryDirectory() as directory:
+        server = None
+        if transport == 'queue':
+            to_prover, to_verifier = QueueChannel(channel_size), QueueChannel(channel_size)
+            prover_ends, verifier_ends = (to_prover, to_verifier), (to_prover, to_verifier)
+        else:
+            prover_end, verifier_end, server = await socket_pair(os.path.join(directory, 'qzkp.sock'),
+                                                                 prover_engine.rng, verifier_engine.rng)
+            prover_ends, verifier_ends = (prover_end, prover_end), (verifier_end, verifier_end)
+        prover = ProverService(prover_engine, a, b, *prover_ends, attack, seeds[2])
+        threshold = acceptance_threshold(key_length, flip_channels(pbit, pphase), True, a, b)
+        verifier = VerifierService(verifier_engine, a, b, *verifier_ends, threshold, max_sessions, seeds[4])
+
+        serving = asyncio.gather(prover.serve(), verifier.receive())
+        start = time.perf_counter()
+        outcomes = await asyncio.gather(*(verifier.prove(int(attack)) for _ in range(sessions)))
+        elapsed = time.perf_counter() - start
+        await verifier.outbox.close()
+        await serving
+        if server is not None:
+            sent = prover_end.sent + verifier_end.sent
+            for end in (prover_end, verifier_end):
+                end.writer.close()
+            server.close()
+            await server.wait_closed()
+
+    latencies = np.array([latency for _, _, latency in outcomes])
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    report = {'sessions': sessions, 'transport': transport, 'seconds': elapsed, 'proofs_per_second': sessions / elapsed,
+              'latency_p50': float(p50), 'latency_p95': float(p95), 'latency_p99': float(p99),
+              'latency_max': float(latencies.max()),
+              'accept_rate': float(np.mean([accepted for _, accepted, _ in outcomes]))}
+    if server is not None:
+        report['bytes_per_proof'] = sent / sessions
+    return report
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Load test of the asyncio prover/verifier services.')
+    parser.add_argument('--sessions', type=int, default=10000)
+    parser.add_argument('--key-length', type=int, default=256)
+    parser.add_argument('--max-sessions', type=int, default=64, help='proof sessions in flight at once')
+    parser.add_argument('--channel-size', type=int, default=64, help='states buffered per channel direction')
+    parser.add_argument('--pbit', type=float, default=0.0)
+    parser.add_argument('--pphase', type=float, default=0.0)
+    parser.add_argument('--attack', action='store_true', help='dishonest prover running intercept-resend')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--transport', choices=TRANSPORTS, default='queue')
+    args = parser.parse_args()
+
+    report = asyncio.run(run_load(args.sessions, args.key_length, args.max_sessions, args.channel_size,
+                                  args.pbit, args.pphase, args.attack, args.seed, args.transport))
+    print(f'{report["sessions"]} proofs in {report["seconds"]:.2f}s: {report["proofs_per_second"]:.0f} proofs/s, '
+          f'accept rate {report["accept_rate"]:.4f}')
+    if 'bytes_per_proof' in report:
+        print(f'{report["bytes_per_proof"]:.0f} bytes per proof on the socket')
+    print(f'latency p50 {report["latency_p50"] * 1e3:.2f} ms, p95 {report["latency_p95"] * 1e3:.2f} ms, '
+          f'p99 {report["latency_p99"] * 1e3:.2f} ms, max {report["latency_max"] * 1e3:.2f} ms')
@@ -0,0 +1,182 @@
+import argparse
+import time
+from collections import defaultdict
+import numpy as np
+from qzkp.analytic import flip_channels
+from qzkp.stabilizer import QubitArray, StabilizerBackend
+from qzkp.verifier import acceptance_threshold
+
+
+#----------------------------------------
+# Key store
+#----------------------------------------
+class KeyStore:
+    '''
+    Secrets (a, b) of every registered session, as uint8 arrays.
+    '''
+    def __init__(self):
+        self.keys = {}
+
+    def add(self, session, a, b):
+        a = np.asarray(a, dtype=np.uint8)
+        b = np.asarray(b, dtype=np.uint8)
+        if a.shape != b.shape or a.ndim != 1:
+            raise ValueError('Same number of a and b bits expected.')
+        self.keys[session] = (a, b)
+
+    def remove(self, session):
+        del self.keys[session]
+
+    def __getitem__(self, session):
+        return self.keys[session]
+
+    def __contains__(self, session):
+        return session in self.keys
+
+    def __len__(self):
+        return len(self.keys)
+
+    def groups(self, sessions):
+        '''
+        Sessions grouped by key length, the unit of a vectorized evaluation.
+        '''
+        groups = defaultdict(list)
+        for session in sessions:
+            groups[len(self.keys[session][0])].append(session)
+        return groups
+
+    def stack(self, sessions):
+        '''
+        (sessions, key_length) arrays of a and b for sessions of one length.
+        '''
+        return tuple(np.stack([self.keys[session][i] for session in sessions]) for i in (0, 1))
+
+
+#----------------------------------------
+# Multi-session verifier
+#----------------------------------------
+class MultiSessionVerifier:
+    '''
+    Bob verifying many provers, each session with its own secrets. Challenge
+    preparation and proof measurement run once for a whole batch of sessions:
+    as (sessions, key_length) arrays on a StabilizerBackend, or as one
+    measurements() call over the qubits of every session on a
+    CircuitProtocol, which a batch_size turns into shared simulator jobs.
+
+    Decisions use the acceptance threshold for uniform keys of each key
+    length under the noise channels of qzkp.analytic.
+    '''
+    def __init__(self, engine, channels, attack=True, max_far=None, seed=None):
+        self.engine = engine
+        self.vectorized = isinstance(engine, StabilizerBackend)
+        self.channels = channels
+        self.attack = attack
+        self.max_far = max_far
+        self.rng = np.random.default_rng(seed)
+        self.keys = KeyStore()
+        self.thresholds = {}
+        self.pending = {}
+
+    def register(self, session, a, b):
+        self.keys.add(session, a, b)
+
+    def drop(self, session):
+        self.keys.remove(session)
+        self.pending.pop(session, None)
+
+    def threshold(self, key_length):
+        if key_length not in self.thresholds:
+            self.thresholds[key_length] = acceptance_threshold(key_length, self.channels, self.attack,
+                                                               max_far=self.max_far)
+        return self.thresholds[key_length]
+
+    def challenges(self, sessions):
+        '''
+        Challenge states of sessions, as a dict session -> state. The
+        challenges c are kept until the proofs are verified.
+        '''
+        engine = self.engine
+        states = {}
+        for key_length, group in self.keys.groups(sessions).items():
+            a, b = self.keys.stack(group)
+            c = self.rng.integers(0, 2, size=a.shape, dtype=np.uint8)
+            if self.vectorized:
+                psi = engine.challenge_gen(engine.psi_gen(a, b), c, b)
+                for i, session in enumerate(group):
+                    states[session] = QubitArray(psi.bit[i], psi.basis[i], psi.pbit, psi.pphase, psi.rng)
+            else:
+                for i, session in enumerate(group):
+                    states[session] = engine.challenge_gen(engine.psi_gen(a[i], b[i]), c[i], b[i])
+            for i, session in enumerate(group):
+                self.pending[session] = c[i]
+        return states
+
+    def verify(self, proofs):
+        '''
+        Measures the proof states of a dict session -> state and returns a
+        dict session -> (matches, accepted).
+        '''
+        engine = self.engine
+        decisions = {}
+        for key_length, group in self.keys.groups(proofs).items():
+            a, b = self.keys.stack(group)
+            if self.vectorized:
+                psi = QubitArray(np.stack([proofs[session].bit for session in group]),
+                                 np.stack([proofs[session].basis for session in group]),
+                                 engine.pbit, engine.pphase, engine.rng)
+                results = engine.measurements(psi, a)
+            else:
+                psi = [qubit for session in group for qubit in proofs[session]]
+                results = engine.measurements(psi, a.ravel())
+            results = np.asarray(results, dtype=np.uint8).reshape(a.shape)
+            c = np.stack([self.pending.pop(session) for session in group])
+            matches = np.count_nonzero((b ^ results) == c, axis=-1)
+            accepted = matches >= self.threshold(key_length).matches
+            for i, session in enumerate(group):
+                decisions[session] = (int(matches[i]), bool(accepted[i]))
+        return decisions
+
+
+#----------------------------------------
+# Throughput
+#----------------------------------------
+def throughput(sessions, batch_size, key_length=256, pbit=0.0, pphase=0.0, seed=None):
+    '''
+    Verifications per second of honest proofs from sessions provers checked
+    batch_size sessions at a time on the stabilizer engine.
+    '''
+    seeds = np.random.SeedSequence(seed).spawn(3)
+    engine = StabilizerBackend(pbit, pphase, seeds[0])
+    verifier = MultiSessionVerifier(engine, flip_channels(pbit, pphase), seed=seeds[1])
+    keys = np.random.default_rng(seeds[2]).integers(0, 2, size=(sessions, 2, key_length), dtype=np.uint8)
+    for session, (a, b) in enumerate(keys):
+        verifier.register(session, a, b)
+    verifier.threshold(key_length)
+
+    start = time.perf_counter()
+    accepted = 0
+    for first in range(0, sessions, batch_size):
+        batch = range(first, min(first + batch_size, sessions))
+        challenges = verifier.challenges(batch)
+        # Honest provers, one per session.
+        proofs = {session: engine.alice_mod(state, *keys[session]) for session, state in challenges.items()}
+        accepted += sum(ok for _, ok in verifier.verify(proofs).values())
+    elapsed = time.perf_counter() - start
+    return {'batch_size': batch_size, 'verifications_per_second': sessions / elapsed, 'accept_rate': accepted / sessions}
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Verifications per second of the multi-session verifier.')
+    parser.add_argument('--sessions', type=int, default=4096)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8, 64, 512, 4096])
+    parser.add_argument('--key-length', type=int, default=256)
+    parser.add_argument('--pbit', type=float, default=0.0)
+    parser.add_argument('--pphase', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    for batch_size in args.batch_sizes:
+        report = throughput(args.sessions, batch_size, args.key_length, args.pbit, args.pphase, args.seed)
+        print(f'batch {batch_size:>6}: {report["verifications_per_second"]:>10.0f} verifications/s, '
+              f'accept rate {report["accept_rate"]:.4f}')
@@ -0,0 +1,156 @@
+import numpy as np
+from qzkp.channels import parse_noise, pauli_channels
+
+
+#----------------------------------------
+# Qubit arrays
+#----------------------------------------
+class QubitArray:
+    '''
+    Independent single qubits restricted to the Z and X eigenstates the
+    protocol uses. Basis 0 holds |bit>, basis 1 holds |+> (bit 0) or |-> (bit 1).
+    Global phases are dropped, they never change a measurement outcome.
+    Arrays may have any shape, e.g. (key_length,) or (rounds, key_length).
+    '''
+    def __init__(self, bit, basis, pbit=0.0, pphase=0.0, rng=None):
+        bit, basis = np.broadcast_arrays(np.asarray(bit, dtype=np.uint8), np.asarray(basis, dtype=np.uint8))
+        self.bit = bit.copy()
+        self.basis = basis.copy()
+        self.pbit = pbit
+        self.pphase = pphase
+        self.rng = rng if rng is not None else np.random.default_rng()
+
+    def __len__(self):
+        return self.bit.shape[-1]
+
+    def _mask(self, mask):
+        '''
+        Broadcasts the state and the gate mask to a common shape.
+        '''
+        mask = np.asarray(mask, dtype=bool)
+        shape = np.broadcast_shapes(self.bit.shape, mask.shape)
+        if shape != self.bit.shape:
+            self.bit = np.broadcast_to(self.bit, shape).copy()
+            self.basis = np.broadcast_to(self.basis, shape).copy()
+        return np.broadcast_to(mask, shape)
+
+    def noise(self, mask):
+        '''
+        Bit-flip with probability pbit and phase-flip with probability pphase
+        on every qubit where a gate was applied.
+        '''
+        if self.pbit:
+            self.x(mask & (self.rng.random(mask.shape) < self.pbit), noisy=False)
+        if self.pphase:
+            self.z(mask & (self.rng.random(mask.shape) < self.pphase), noisy=False)
+
+    def x(self, mask, noisy=True):
+        mask = self._mask(mask)
+        # X|+> = |+> and X|-> = -|->, only the Z basis bit flips.
+        self.bit ^= (mask & (self.basis == 0)).astype(np.uint8)
+        if noisy:
+            self.noise(mask)
+
+    def z(self, mask, noisy=True):
+        mask = self._mask(mask)
+        self.bit ^= (mask & (self.basis == 1)).astype(np.uint8)
+        if noisy:
+            self.noise(mask)
+
+    def h(self, mask, noisy=True):
+        mask = self._mask(mask)
+        # H maps |0>,|1> to |+>,|->, keeping the bit.
+        self.basis ^= mask.astype(np.uint8)
+        if noisy:
+            self.noise(mask)
+
+    def measure(self):
+        '''
+        Computational basis measurement, uniform outcome for X eigenstates.
+        '''
+        coin = self.rng.integers(0, 2, size=self.bit.shape, dtype=np.uint8)
+        return np.where(self.basis == 0, self.bit, coin)
+
+
+#----------------------------------------
+# Protocol backend
+#----------------------------------------
+class StabilizerBackend:
+    '''
+    NumPy replacement for the circuit based protocol functions. Method
+    signatures match the scripts, and the bit-flip/phase-flip noise is
+    injected after exactly the same gates as in QZKP_noise_flip.py. stages
+    adds qzkp.channels stage noise, Pauli channels only.
+    '''
+    def __init__(self, pbit=0.0, pphase=0.0, seed=None, stages=None):
+        self.pbit = pbit
+        self.pphase = pphase
+        self.rng = np.random.default_rng(seed)
+        self.stages = pauli_channels(parse_noise(stages)) if stages else {}
+
+    def reseed(self, seed):
+        self.rng = np.random.default_rng(seed)
+
+    def noise(self, psi, *stages):
+        '''
+        Applies the Pauli channels of the given protocol stages to psi.
+        '''
+        for stage in stages:
+            for px, py, pz in self.stages.get(stage, ()):
+                u = self.rng.random(psi.bit.shape)
+                # X and Y flip Z basis values, Y and Z flip X basis values.
+                psi.x(u < px + py, noisy=False)
+                psi.z((u >= px) & (u < px + py + pz), noisy=False)
+        return psi
+
+    def psi_gen(self, a, b):
+        '''
+        Generation of the quantum state |psi>.
+        '''
+        if np.shape(a)[-1] != np.shape(b)[-1]:
+            raise ValueError('Same number of b and bits expected.')
+        psi = QubitArray(0, 0, self.pbit, self.pphase, self.rng)
+        psi.x(np.asarray(a) == 1)
+        psi.h(np.asarray(b) == 1, noisy=False)
+        return psi
+
+    def challenge_gen(self, psi, c, b):
+        '''
+        Generation of the challenge for |psi>.
+        '''
+        if len(psi) != np.shape(c)[-1]:
+            raise ValueError('Same number of qubits and bits expected.')
+        c = np.asarray(c) == 1
+        b = np.asarray(b) == 1
+        psi.x(c & ~b)
+        psi.z(c & b)
+        return psi
+
+    def alice_mod(self, psi, a, b):
+        if len(psi) != np.shape(a)[-1] or len(psi) != np.shape(b)[-1]:
+            raise ValueError('Same number of qubits and bits expected.')
+        a = np.asarray(a) == 1
+        b = np.asarray(b) == 1
+        psi.z(b)
+        psi.h(a ^ b)
+        psi.z(a)
+        return psi
+
+    def zk_mod(self, psi, p):
+        '''
+        Alice Zero-Knowledge momdifications to the state |psi>.
+        '''
+        if len(psi) != np.shape(p)[-1]:
+            raise ValueError('Same number of qubits and bits expected.')
+        psi.h(np.asarray(p) == 1, noisy=False)
+        return psi
+
+    def measurements(self, psi, b):
+        '''
+        Measurement of every qubit in the basis given by b.
+        '''
+        if len(psi) != np.shape(b)[-1]:
+            raise ValueError('Same number of qubits and b expected.')
+        psi.h(np.asarray(b) == 1)
+        return self.noise(psi, 'measure').measure()
+
@@ -0,0 +1,239 @@
+import json
+import math
+from statistics import NormalDist
+import numpy as np
+
+
+#----------------------------------------
+# Running moments
+#----------------------------------------
+class Welford:
+    '''
+    Running count, mean and variance (Welford's update), numerically stable
+    over any number of rounds and mergeable across workers.
+    '''
+    __slots__ = ('count', 'mean', 'm2')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+
+    def update_many(self, values):
+        other = Welford()
+        values = np.asarray(values, dtype=float)
+        if len(values):
+            other.count, other.mean = len(values), float(values.mean())
+            other.m2 = float(((values - other.mean) ** 2).sum())
+            self.merge(other)
+
+    def merge(self, other):
+        '''
+        Chan et al. pairwise combination of two running moments.
+        '''
+        count = self.count + other.count
+        if count == 0:
+            return
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.mean += delta * other.count / count
+        self.count = count
+
+    @property
+    def variance(self):
+        '''
+        Sample variance (n - 1 denominator).
+        '''
+        return self.m2 / (self.count - 1) if self.count > 1 else math.nan
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    def sem(self):
+        '''
+        Standard error of the mean.
+        '''
+        return math.sqrt(self.variance / self.count) if self.count > 1 else math.inf
+
+    def confidence_interval(self, confidence=0.95):
+        '''
+        Normal approximation two sided interval of the mean.
+        '''
+        half = NormalDist().inv_cdf((1 + confidence) / 2) * self.sem()
+        return self.mean - half, self.mean + half
+
+
+#----------------------------------------
+# Streaming histogram
+#----------------------------------------
+class Histogram:
+    '''
+    Fixed bin histogram of percentages, [low, high] split into bins equal
+    bins, the last one closed.
+    '''
+    def __init__(self, bins=100, low=0.0, high=100.0):
+        self.low = low
+        self.high = high
+        self.counts = np.zeros(bins, dtype=np.int64)
+
+    @property
+    def edges(self):
+        return np.linspace(self.low, self.high, len(self.counts) + 1)
+
+    def _index(self, values):
+        scaled = (np.asarray(values, dtype=float) - self.low) / (self.high - self.low) * len(self.counts)
+        return np.clip(scaled.astype(np.int64), 0, len(self.counts) - 1)
+
+    def update(self, x):
+        self.counts[self._index(x)] += 1
+
+    def update_many(self, values):
+        self.counts += np.bincount(self._index(values), minlength=len(self.counts))
+
+    def quantile(self, q):
+        '''
+        q-quantile, linearly interpolated inside its bin.
+        '''
+        total = self.counts.sum()
+        if total == 0:
+            return math.nan
+        cumulative = np.cumsum(self.counts)
+        target = q * total
+        i = int(np.searchsorted(cumulative, target))
+        i = min(i, len(self.counts) - 1)
+        before = cumulative[i - 1] if i else 0
+        edges = self.edges
+        fraction = (target - before) / self.counts[i] if self.counts[i] else 0.0
+        return float(edges[i] + fraction * (edges[i + 1] - edges[i]))
+
+
+#----------------------------------------
+# Per decision class statistics
+#----------------------------------------
+CLASSES = {0: 'honest', 1: 'attack'}
+
+class AccuracyStats:
+    '''
+    Online statistics of equal_entries_percentage for each decision class,
+    updated every round, with the early stopping rules of the scripts:
+
+    confidence: stop once the honest mean exceeds the attack mean with this
+                one sided confidence (Welch z statistic). The test is repeated
+                after every round, so look k spends alpha_k = (1 - confidence)
+                * 6 / (pi² k²) of the error budget. The alpha_k sum to
+                1 - confidence, which bounds the chance of ever stopping on a
+                wrong separation.
+    precision:  stop once the confidence interval of every observed class
+                mean is at most ±precision percentage points.
+
+    Neither rule fires before every observed class has min_rounds rounds,
+    so the normal approximation holds. With both set both must hold.
+    '''
+    def __init__(self, confidence=None, precision=None, interval=0.95, min_rounds=30, bins=100):
+        self.confidence = confidence
+        self.precision = precision
+        self.interval = interval
+        self.min_rounds = min_rounds
+        self.moments = {dec: Welford() for dec in CLASSES}
+        self.histograms = {dec: Histogram(bins) for dec in CLASSES}
+        self.rounds = 0
+        self.looks = 0
+        self.stopped_at = None
+
+    def update(self, percentage, dec=1):
+        self.rounds += 1
+        self.moments[dec].update(percentage)
+        self.histograms[dec].update(percentage)
+
+    def separation(self):
+        '''
+        Welch z statistic of honest mean minus attack mean.
+        '''
+        honest, attack = self.moments[0], self.moments[1]
+        if honest.count < 2 or attack.count < 2:
+            return math.nan
+        spread = math.sqrt(honest.variance / honest.count + attack.variance / attack.count)
+        difference = honest.mean - attack.mean
+        if spread == 0:
+            return math.inf if difference > 0 else -math.inf if difference < 0 else math.nan
+        return difference / spread
+
+    def boundary(self):
+        '''
+        z the separation must exceed at the next look of the confidence rule.
+        '''
+        self.looks += 1
+        alpha = (1 - self.confidence) * 6 / (math.pi**2 * self.looks**2)
+        return NormalDist().inv_cdf(1 - alpha)
+
+    def should_stop(self):
+        '''
+        True, and records the round, once the configured rules hold.
+        '''
+        if self.confidence is None and self.precision is None:
+            return False
+        observed = [moments for moments in self.moments.values() if moments.count]
+        if not observed or any(moments.count < self.min_rounds for moments in observed):
+            return False
+        if self.confidence is not None:
+            if self.moments[0].count == 0 or self.moments[1].count == 0:
+                return False
+            if not self.separation() > self.boundary():
+                return False
+        if self.precision is not None:
+            for moments in observed:
+                low, high = moments.confidence_interval(self.interval)
+                if (high - low) / 2 > self.precision:
+                    return False
+        self.stopped_at = self.rounds
+        return True
+
+    def summary(self):
+        classes = {}
+        for dec, name in CLASSES.items():
+            moments = self.moments[dec]
+            if moments.count == 0:
+                continue
+            low, high = moments.confidence_interval(self.interval)
+            classes[name] = {'rounds': moments.count, 'mean': moments.mean, 'std': moments.std,
+                             'ci_low': low, 'ci_high': high,
+                             'histogram': self.histograms[dec].counts.tolist()}
+        return {'rounds': self.rounds, 'stopped_at': self.stopped_at, 'interval': self.interval,
+                'separation_z': self.separation(), 'classes': classes}
+
+    def format_summary(self):
+        summary = self.summary()
+        lines = []
+        if summary['stopped_at'] is not None:
+            lines.append(f'Stopped early after {summary["stopped_at"]} rounds.')
+        for name, row in summary['classes'].items():
+            lines.append(f'{name:<7} rounds {row["rounds"]:>9}  mean {row["mean"]:8.4f}%  std {row["std"]:8.4f}  '
+                         f'{self.interval:.0%} CI [{row["ci_low"]:.4f}, {row["ci_high"]:.4f}]')
+        if not math.isnan(summary['separation_z']):
+            lines.append(f'honest - attack separation z = {summary["separation_z"]:.2f}')
+        return '\n'.join(lines)
+
+    def write_json(self, path):
+        summary = self.summary()
+        summary['edges'] = self.histograms[0].edges.tolist()
+        with open(path, 'w') as f:
+            json.dump(_finite(summary), f, indent=1)
+
+def _finite(value):
+    '''
+    JSON has no NaN or infinity, they are stored as null.
+    '''
+    if isinstance(value, dict):
+        return {name: _finite(item) for name, item in value.items()}
+    if isinstance(value, list):
+        return [_finite(item) for item in value]
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
@@ -0,0 +1,120 @@
+import argparse
+import numpy as np
+from qzkp.channels import parse_noise, pauli_channels
+from qzkp.protocol import intercept_resend
+from qzkp.randomness import RandomSource
+from qzkp.seeding import child, reseed
+from qzkp.stabilizer import StabilizerBackend
+from qzkp.verifier import count_matches
+
+
+#----------------------------------------
+# Streamed keys
+#----------------------------------------
+# Qubits per block of the pipeline, about 64 KB per state array on the stabilizer engine.
+CHUNK_BITS = 1 << 16
+
+class KeyStream:
+    '''
+    Secrets a, b of length bits that are never held in memory at once:
+    block i is regenerated from child i of seed whenever it is iterated, so
+    the keys depend on seed and chunk.
+    '''
+    def __init__(self, length, seed=None, chunk=CHUNK_BITS):
+        self.length = length
+        self.seed = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        self.chunk = chunk
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        for i, start in enumerate(range(0, self.length, self.chunk)):
+            size = min(self.chunk, self.length - start)
+            a, b = np.random.default_rng(child(self.seed, i)).integers(0, 2, size=(2, size), dtype=np.uint8)
+            yield a, b
+
+
+#----------------------------------------
+# Pipeline
+#----------------------------------------
+def challenges(engine, keys, rand):
+    '''
+    (a, b, c, challenge_state) per key block, prepared by Bob and sent.
+    '''
+    for a, b in keys:
+        c = rand.bits(len(a))
+        psi = engine.challenge_gen(engine.psi_gen(a, b), c, b)
+        yield a, b, c, engine.noise(psi, 'prepare', 'to_prover')
+
+def proofs(engine, blocks, rand, prover='honest'):
+    '''
+    (a, b, c, proof_state) per block from the honest prover, Eve's
+    intercept-resend attack ('attack') or a random guess ('guess', the
+    state is None and c_aprox random).
+    '''
+    for a, b, c, psi in blocks:
+        if prover == 'honest':
+            yield a, b, c, engine.noise(engine.alice_mod(psi, a, b), 'prover', 'to_verifier')
+        elif prover == 'attack':
+            yield a, b, c, intercept_resend(engine, rand, psi, a ^ b)
+        else:
+            yield a, b, c, None
+
+def matches(engine, blocks, rand):
+    '''
+    Matches between c and c_aprox per block, measured by Bob.
+    '''
+    for a, b, c, psi in blocks:
+        if psi is None:
+            yield count_matches(c, rand.bits(len(c)))
+        else:
+            yield count_matches(c, b ^ np.asarray(engine.measurements(psi, a), dtype=np.uint8))
+
+def stream_round(engine, keys, rand, prover='honest'):
+    '''
+    Matches of one round over the key blocks of keys (a KeyStream or any
+    iterable of (a, b) arrays). Only one block of qubits is alive at a time,
+    so memory does not grow with the key length.
+    '''
+    return int(sum(matches(engine, proofs(engine, challenges(engine, keys, rand), rand, prover), rand)))
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Protocol rounds over very long keys, streamed in blocks.')
+    parser.add_argument('key_length', type=int)
+    parser.add_argument('num_iter', type=int)
+    parser.add_argument('--chunk', type=int, default=CHUNK_BITS, help='qubits per block')
+    parser.add_argument('--prover', choices=['honest', 'attack', 'guess'], default='honest')
+    parser.add_argument('--backend', choices=['numpy', 'aer'], default='numpy', help='vectorized NumPy stabilizer engine or Aer circuits, one block of circuits alive at a time')
+    parser.add_argument('--pbit', type=float, default=0.0)
+    parser.add_argument('--pphase', type=float, default=0.0)
+    parser.add_argument('--stage-noise', nargs='+', default=[], metavar='STAGE:CHANNEL:P')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    try:
+        stage_noise = parse_noise(args.stage_noise)
+        if args.backend == 'numpy':
+            # The stabilizer engine only tracks Pauli channels.
+            pauli_channels(stage_noise)
+    except ValueError as error:
+        parser.error(str(error))
+    keys_seed, rounds_seed = np.random.SeedSequence(args.seed).spawn(2)
+    keys = KeyStream(args.key_length, keys_seed, args.chunk)
+    if args.backend == 'numpy':
+        engine = StabilizerBackend(args.pbit, args.pphase, stages=args.stage_noise)
+    else:
+        from qiskit_aer import AerSimulator
+        from qzkp.noise import PauliInjector
+        from qzkp.protocol import CircuitProtocol
+
+        # Every round is reseeded, so the Aer jobs are the fixed seed blocks of qzkp.seeding.
+        engine = CircuitProtocol(AerSimulator(), transpiled=True,
+                                 inject=PauliInjector(args.pbit, args.pphase, np.random.default_rng()), stages=args.stage_noise)
+    rand = RandomSource('numpy')
+    for i in range(args.num_iter):
+        reseed(rounds_seed, i, rand, engine)
+        count = stream_round(engine, keys, rand, args.prover)
+        print(f'Round {i + 1}: {count}/{args.key_length} matches ({count / args.key_length * 100:.4f}%)')
@@ -0,0 +1,255 @@
+import argparse
+import importlib
+import itertools
+import json
+import multiprocessing as mp
+import os
+import time
+import zlib
+import numpy as np
+from qzkp.seeding import child
+
+
+#----------------------------------------
+# Grid specification
+#----------------------------------------
+# Protocol script of each sweep kind and its default point parameters.
+SCRIPTS = {
+    'ideal': 'QZKP_attack_ideal',
+    'flip': 'QZKP_noise_flip',
+    'damping': 'QZKP_noise_damping',
+}
+DEFAULTS = {
+    'ideal': {'batch_size': 0, 'grouped': False, 'wide': False, 'backend': 'aer', 'rng': 'numpy', 'cache_size': 0,
+              'profile': False, 'trace': False},
+    'flip': {'pbit': 0.0, 'pphase': 0.0, 'batch_size': 0, 'grouped': False, 'wide': False, 'backend': 'aer',
+             'rng': 'numpy', 'native_noise': False, 'attack': True, 'cache_size': 0, 'stage_noise': '', 'profile': False,
+             'trace': False},
+    'damping': {'gamma': 0.0, 'lam': 0.0, 'batch_size': 0, 'grouped': False, 'wide': False, 'rng': 'numpy', 'attack': True,
+                'cache_size': 0, 'stage_noise': '', 'profile': False, 'trace': False},
+}
+
+def grid_points(spec):
+    '''
+    Cartesian product of the spec. List values are swept, scalars are fixed.
+    spec = {'script': 'flip', 'key_length': [64, 128], 'num_iter': 1000, 'pbit': [0, 0.01]}
+    '''
+    spec = dict(spec)
+    script = spec.pop('script')
+    if script not in SCRIPTS:
+        raise ValueError(f'Unknown script {script!r}, expected one of {list(SCRIPTS)}.')
+    for name in ('key_length', 'num_iter'):
+        if name not in spec:
+            raise ValueError(f'The grid spec needs {name}.')
+    names = sorted(spec)
+    values = [spec[name] if isinstance(spec[name], list) else [spec[name]] for name in names]
+    for combination in itertools.product(*values):
+        params = dict(DEFAULTS[script])
+        params.update(zip(names, combination))
+        yield script, params
+
+def point_key(script, params):
+    '''
+    Directory name of a grid point, e.g. flip_key_length=64_num_iter=1000_pbit=0.01.
+    '''
+    swept = '_'.join(f'{name}={params[name]}' for name in sorted(params) if name not in DEFAULTS[script])
+    defaults = '_'.join(f'{name}={params[name]}' for name in sorted(DEFAULTS[script]) if params[name] != DEFAULTS[script][name])
+    return '_'.join(part for part in (script, swept, defaults) if part)
+
+def point_seed(seed, key, *path):
+    '''
+    SeedSequence of a point (or of one of its chunks) that does not depend on
+    the grid order or on which chunks were already completed.
+    '''
+    return np.random.SeedSequence([seed, zlib.crc32(key.encode()), *path])
+
+
+#----------------------------------------
+# Results store
+#----------------------------------------
+def chunk_path(point_dir, start, stop):
+    return os.path.join(point_dir, f'rounds_{start:010d}_{stop:010d}.npz')
+
+def atomic_savez(path, **arrays):
+    '''
+    np.savez through a temporary file, so a preempted run never leaves a
+    truncated chunk behind.
+    '''
+    tmp = path + '.tmp.npz'
+    np.savez(tmp, **arrays)
+    os.replace(tmp, path)
+
+def completed_chunks(point_dir):
+    done = set()
+    if os.path.isdir(point_dir):
+        for name in os.listdir(point_dir):
+            if name.startswith('rounds_') and name.endswith('.npz') and '.tmp' not in name:
+                start, stop = name[len('rounds_'):-len('.npz')].split('_')
+                done.add((int(start), int(stop)))
+    return done
+
+def uncovered(done, num_iter, chunk_size):
+    '''
+    (start, stop) ranges of at most chunk_size rounds, aligned to multiples
+    of chunk_size, of the rounds 0..num_iter-1 that no chunk in done covers.
+    Completion is decided by round, so a sweep resumed with another chunk
+    size only runs the missing rounds.
+    '''
+    missing = np.ones(num_iter, dtype=bool)
+    for start, stop in done:
+        missing[start:stop] = False
+    ranges = []
+    for first in range(0, num_iter, chunk_size):
+        block = missing[first:first + chunk_size]
+        # Runs of missing rounds in the block, from the edges of the mask.
+        edges = np.flatnonzero(np.diff(np.concatenate(([False], block, [False])).astype(np.int8)))
+        ranges.extend((first + int(start), first + int(stop)) for start, stop in zip(edges[::2], edges[1::2]))
+    return ranges
+
+def prepare_point(store, script, params, seed):
+    '''
+    Creates the point directory with its parameters, the sweep seed and
+    fixed keys a, b on first use, and returns it. Resumed runs reuse the
+    stored keys and must use the same seed, as it also seeds the rounds.
+    '''
+    key = point_key(script, params)
+    point_dir = os.path.join(store, key)
+    os.makedirs(point_dir, exist_ok=True)
+    params_file = os.path.join(point_dir, 'params.json')
+    if os.path.exists(params_file):
+        with open(params_file) as f:
+            stored = json.load(f).get('sweep_seed', seed)
+        if stored != seed:
+            raise ValueError(f'{point_dir} was run with seed {stored}, not {seed}.')
+    else:
+        with open(params_file + '.tmp', 'w') as f:
+            json.dump({'script': script, **params, 'sweep_seed': seed}, f, indent=1)
+        os.replace(params_file + '.tmp', params_file)
+    keys = os.path.join(point_dir, 'keys.npz')
+    if not os.path.exists(keys):
+        rng = np.random.default_rng(point_seed(seed, key))
+        a = rng.integers(0, 2, size=params['key_length'], dtype=np.uint8)
+        b = rng.integers(0, 2, size=params['key_length'], dtype=np.uint8)
+        atomic_savez(keys, a=a, b=b)
+    return point_dir
+
+def load(store):
+    '''
+    Every stored round as a DataFrame with the point parameters as columns,
+    including partially completed points. A round stored by overlapping
+    chunks is returned once.
+    '''
+    import pandas as pd
+
+    frames = []
+    for key in sorted(os.listdir(store)):
+        point_dir = os.path.join(store, key)
+        params_file = os.path.join(point_dir, 'params.json')
+        if not os.path.exists(params_file):
+            continue
+        with open(params_file) as f:
+            params = json.load(f)
+        chunks = []
+        for start, stop in sorted(completed_chunks(point_dir)):
+            with np.load(chunk_path(point_dir, start, stop)) as chunk:
+                chunks.append(pd.DataFrame({name: chunk[name] for name in chunk.files}))
+        if not chunks:
+            continue
+        frame = pd.concat(chunks, ignore_index=True).drop_duplicates('Iteration')
+        for name, value in params.items():
+            frame[name] = value
+        frames.append(frame)
+    if not frames:
+        return pd.DataFrame(columns=['Iteration', 'Decision', 'Percentages'])
+    return pd.concat(frames, ignore_index=True)
+
+
+#----------------------------------------
+# Scheduling
+#----------------------------------------
+def run_chunk(task):
+    '''
+    Runs rounds start..stop-1 of one grid point and stores them.
+    '''
+    script, params, point_dir, start, stop, seed = task
+    module = importlib.import_module(SCRIPTS[script])
+    with np.load(os.path.join(point_dir, 'keys.npz')) as keys:
+        a, b = keys['a'], keys['b']
+    key = os.path.basename(point_dir)
+    # Rounds are seeded by iteration, so results do not depend on the chunk size.
+    config = argparse.Namespace(**{name: value for name, value in params.items() if name != 'num_iter'},
+                                a=a, b=b, rounds_seed=child(point_seed(seed, key), 0))
+    module.setup(point_seed(seed, key, start), config)
+    round_fn = getattr(module, 'protocol_round', None) or module.attack_round
+
+    percentages = np.empty(stop - start)
+    decisions = np.ones(stop - start, dtype=np.uint8) # Every ideal round is an attack
+    for k, iteration in enumerate(range(start, stop)):
+        result = round_fn(iteration)
+        if isinstance(result, tuple):
+            percentages[k], decisions[k] = result
+        else:
+            percentages[k] = result
+    atomic_savez(chunk_path(point_dir, start, stop),
+                 Iteration=np.arange(start + 1, stop + 1), Decision=decisions, Percentages=percentages)
+    return stop - start
+
+def pending_tasks(spec, store, chunk_size, seed):
+    '''
+    Chunks of the rounds of every grid point that are not in the store yet.
+    '''
+    tasks = []
+    for script, params in grid_points(spec):
+        point_dir = prepare_point(store, script, params, seed)
+        for start, stop in uncovered(completed_chunks(point_dir), params['num_iter'], chunk_size):
+            tasks.append((script, params, point_dir, start, stop, seed))
+    return tasks
+
+def run_sweep(spec, store, workers=1, chunk_size=100, seed=0, progress=None):
+    '''
+    Runs every pending chunk of the grid, in parallel when workers != 1 (0
+    uses every core). The seed, stored keys and per round seeding make a
+    resumed sweep continue exactly where the interrupted one stopped, with
+    any chunk size.
+    progress(done, total) is called with the number of rounds completed.
+    '''
+    os.makedirs(store, exist_ok=True)
+    tasks = pending_tasks(spec, store, chunk_size, seed)
+    total = sum(stop - start for _, _, _, start, stop, _ in tasks)
+    if not tasks:
+        return 0
+    done = 0
+    if workers == 1:
+        for count in map(run_chunk, tasks):
+            done += count
+            if progress is not None:
+                progress(done, total)
+    else:
+        with mp.get_context().Pool(workers or os.cpu_count()) as pool:
+            for count in pool.imap_unordered(run_chunk, tasks):
+                done += count
+                if progress is not None:
+                    progress(done, total)
+    return total
+
+
+#----------------------------------------
+# Command line
+#----------------------------------------
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Resumable parameter sweep of the QZKP scripts.')
+    parser.add_argument('spec', help='JSON file with the grid spec, e.g. {"script": "flip", "key_length": [64, 128], "num_iter": 1000, "pbit": [0, 0.01]}')
+    parser.add_argument('store', help='results directory, reused to resume')
+    parser.add_argument('--workers', type=int, default=1, help='processes running the chunks, 0 uses every core')
+    parser.add_argument('--chunk-size', type=int, default=100, help='rounds per stored chunk')
+    parser.add_argument('--seed', type=int, default=0, help='sweep seed, a resumed store must use the same one')
+    args = parser.parse_args()
+
+    with open(args.spec) as f:
+        spec = json.load(f)
+    loading_bar = importlib.import_module(SCRIPTS[spec['script']]).loading_bar
+    start_time = time.time()
+    total = run_sweep(spec, args.store, args.workers, args.chunk_size, args.seed,
+                      lambda done, total: loading_bar(done, total, start_time))
+    print(f'{total} rounds run, results in {args.store}')
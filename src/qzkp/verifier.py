@@ -0,0 +1,146 @@
+import argparse
+from collections import namedtuple
+import numpy as np
+from qzkp.analytic import flip_channels, match_distribution
+from qzkp.bitvec import BitVector
+
+
+#----------------------------------------
+# Error rates
+#----------------------------------------
+# Bob accepts a round when at least `matches` challenge bits are recovered.
+Threshold = namedtuple('Threshold', ['key_length', 'matches', 'far', 'frr'])
+
+def error_rates(honest_pmf, dishonest_pmf):
+    '''
+    False accept and false reject rates of every threshold t = 0..n+1
+    (accept when matches >= t), from the match count pmfs.
+    '''
+    frr = np.concatenate(([0.0], np.cumsum(honest_pmf)))
+    far = np.concatenate((np.cumsum(dishonest_pmf[::-1])[::-1], [0.0]))
+    return np.clip(far, 0, 1), np.clip(frr, 0, 1)
+
+def choose_threshold(honest_pmf, dishonest_pmf, max_far=None, far_weight=1.0):
+    '''
+    Threshold minimizing far_weight * FAR + FRR, or with max_far the lowest
+    one (so the lowest FRR) whose FAR does not exceed it.
+    '''
+    far, frr = error_rates(honest_pmf, dishonest_pmf)
+    if max_far is not None:
+        t = int(np.argmax(far <= max_far))
+    else:
+        t = int(np.argmin(far_weight * far + frr))
+    return Threshold(len(honest_pmf) - 1, t, float(far[t]), float(frr[t]))
+
+def acceptance_threshold(key_length, channels, attack=True, a=None, b=None, max_far=None, far_weight=1.0):
+    '''
+    Threshold separating the honest prover from the intercept-resend attack
+    (or from random guessing when attack is False) under the noise channels
+    of qzkp.analytic, for the keys a, b or for uniform keys.
+    '''
+    honest = match_distribution(key_length, channels, 'honest', a, b)
+    dishonest = match_distribution(key_length, channels, 'attack' if attack else 'guess', a, b)
+    return choose_threshold(honest, dishonest, max_far, far_weight)
+
+def smallest_key_length(channels, max_far, max_frr, attack=True, max_length=4096):
+    '''
+    Smallest key length (uniform keys) with a threshold meeting both error
+    budgets, or None up to max_length. The rates are not monotone in the key
+    length because match counts are discrete, so every length is checked.
+    '''
+    for key_length in range(1, max_length + 1):
+        threshold = acceptance_threshold(key_length, channels, attack, max_far=max_far)
+        if threshold.far <= max_far and threshold.frr <= max_frr:
+            return threshold
+    return None
+
+
+#----------------------------------------
+# Acceptance decisions
+#----------------------------------------
+def count_matches(c, c_aprox):
+    '''
+    Matches between challenges and their approximations: BitVectors are
+    counted by popcount, (..., N) bit arrays along the last axis.
+    '''
+    if isinstance(c, BitVector) and isinstance(c_aprox, BitVector):
+        return c.matches(c_aprox)
+    return np.count_nonzero(np.asarray(c) == np.asarray(c_aprox), axis=-1)
+
+class Verifier:
+    '''
+    Bob's accept/reject decision at a fixed threshold, with a tally of the
+    decisions per prover class (0 honest, 1 dishonest) to compare the
+    observed error rates with the predicted ones.
+    '''
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.accepted = np.zeros(2, dtype=np.int64)
+        self.rounds = np.zeros(2, dtype=np.int64)
+
+    def accept(self, matches):
+        '''
+        Decision for a match count or an array of them.
+        '''
+        return np.asarray(matches) >= self.threshold.matches
+
+    def record(self, matches, dec):
+        '''
+        Decisions for rounds with prover classes dec, tallied and returned.
+        '''
+        accepted = self.accept(matches)
+        dec = np.asarray(dec)
+        self.rounds += np.bincount(dec.ravel(), minlength=2)[:2]
+        self.accepted += np.bincount(dec.ravel(), weights=accepted.ravel(), minlength=2)[:2].astype(np.int64)
+        return accepted
+
+    def observed(self):
+        '''
+        (FAR, FRR) measured over the recorded rounds, NaN without rounds.
+        '''
+        with np.errstate(invalid='ignore', divide='ignore'):
+            far = self.accepted[1] / self.rounds[1]
+            frr = 1 - self.accepted[0] / self.rounds[0]
+        return float(far), float(frr)
+
+    def format_report(self):
+        far, frr = self.observed()
+        t = self.threshold
+        return (f'Accept with >= {t.matches}/{t.key_length} matches: '
+                f'predicted FAR {t.far:.3e} FRR {t.frr:.3e}, '
+                f'observed FAR {far:.3e} ({self.accepted[1]}/{self.rounds[1]}) '
+                f'FRR {frr:.3e} ({self.rounds[0] - self.accepted[0]}/{self.rounds[0]})')
+
+
+#----------------------------------------
+# Command line
+#----------------------------------------
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Acceptance threshold and smallest key length meeting an error budget.')
+    parser.add_argument('noise', choices=['flip', 'damping'])
+    parser.add_argument('p1', type=float, help='pbit (flip) or gamma (damping)')
+    parser.add_argument('p2', type=float, help='pphase (flip) or lam (damping)')
+    parser.add_argument('--max-far', type=float, default=1e-6)
+    parser.add_argument('--max-frr', type=float, default=1e-6)
+    parser.add_argument('--key-length', type=int, default=None, help='only print the threshold of this key length')
+    parser.add_argument('--max-length', type=int, default=4096)
+    parser.add_argument('--guess', action='store_true', help='dishonest prover guessing c instead of the intercept-resend attack')
+    args = parser.parse_args()
+
+    if args.noise == 'flip':
+        channels = flip_channels(args.p1, args.p2)
+    else:
+        # Probabilities of the transpiled damping circuits the script runs.
+        from qzkp.noise import damping_circuit_channels
+
+        channels = damping_circuit_channels(args.p1, args.p2)
+    if args.key_length:
+        threshold = acceptance_threshold(args.key_length, channels, not args.guess, max_far=args.max_far)
+    else:
+        threshold = smallest_key_length(channels, args.max_far, args.max_frr, not args.guess, args.max_length)
+    if threshold is None:
+        print(f'No key length up to {args.max_length} meets FAR <= {args.max_far} and FRR <= {args.max_frr}.')
+    else:
+        print(f'key_length {threshold.key_length}: accept with >= {threshold.matches} matches, '
+              f'FAR {threshold.far:.3e}, FRR {threshold.frr:.3e}')
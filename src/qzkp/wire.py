@@ -0,0 +1,173 @@
+import struct
+from collections import namedtuple
+import numpy as np
+from qzkp.bitvec import BitVector
+from qzkp.stabilizer import QubitArray
+
+
+#----------------------------------------
+# Layout
+#----------------------------------------
+# Little endian header, padded to 40 bytes so the bitfields start 8 byte aligned:
+# magic, version, flags, noise kind, rows, key length, two noise parameters.
+HEADER = struct.Struct('<4sBBBxIQdd4x')
+MAGIC = b'QZKS'
+VERSION = 1
+# flags
+FRAME = 1
+BATCH = 2
+# Noise kinds and the meaning of their two parameters.
+NOISE = {'none': (), 'flip': ('pbit', 'pphase'), 'damping': ('gamma', 'lam')}
+_NOISE_CODES = list(NOISE)
+
+WireState = namedtuple('WireState', ['key_length', 'batched', 'noise', 'params', 'value', 'basis', 'frame'])
+WireState.__doc__ = '''
+Decoded message. value and basis are (rows, words) uint64 views of the
+buffer in the BitVector layout, frame is None or a (2, rows, words) view of
+the X and Z parts of the Pauli frame still to be applied. batched tells a
+(rows, key_length) batch from a single state.
+'''
+
+def _words(length):
+    return -(-length // 64)
+
+def _pack(bits, rows, length):
+    '''
+    (rows, words) uint64 little endian packing of a (rows, length) bit array.
+    '''
+    packed = np.zeros((rows, _words(length) * 8), dtype=np.uint8)
+    packed[:, :-(-length // 8)] = np.packbits(np.asarray(bits, dtype=np.uint8).reshape(rows, length), axis=-1, bitorder='little')
+    return packed.view('<u8')
+
+
+#----------------------------------------
+# Encoding
+#----------------------------------------
+def encode(value, basis, frame=None, noise='none', params=()):
+    '''
+    Message for the qubits prepared in basis (0 Z, 1 X) holding value, with
+    an optional Pauli frame (frame_x, frame_z) applied on top. Arrays are
+    (key_length,) for one state or (rows, key_length) for a batch of rounds.
+    '''
+    if noise not in NOISE:
+        raise ValueError(f'Unknown noise kind {noise!r}, expected one of {tuple(NOISE)}.')
+    value, basis = np.broadcast_arrays(np.asarray(value), np.asarray(basis))
+    fields = [value, basis] if frame is None else [value, basis, *np.broadcast_arrays(*frame, value)[:2]]
+    shape = value.shape
+    length = shape[-1]
+    rows = int(np.prod(shape[:-1], dtype=np.int64))
+    params = tuple(params) + (0.0,) * (2 - len(params))
+    flags = (FRAME if frame is not None else 0) | (BATCH if len(shape) > 1 else 0)
+    header = HEADER.pack(MAGIC, VERSION, flags, _NOISE_CODES.index(noise), rows, length, *params)
+    return header + b''.join(_pack(field, rows, length).tobytes() for field in fields)
+
+def encode_qubits(psi):
+    '''
+    Message for a qzkp.stabilizer.QubitArray, with its flip noise as metadata.
+    '''
+    noise = 'flip' if psi.pbit or psi.pphase else 'none'
+    return encode(psi.bit, psi.basis, noise=noise, params=(psi.pbit, psi.pphase) if noise == 'flip' else ())
+
+def _gate_names(qubit):
+    if hasattr(qubit, 'gates'):
+        return list(qubit.gates)
+    return [instruction.operation.name for instruction in qubit.data]
+
+def circuit_state(psi):
+    '''
+    (value, basis) arrays of a list of single qubit circuits or QubitRecipes
+    built by the protocol functions, before measurement. The S SX S of
+    qzkp.noise.noiseless_h counts as a Hadamard.
+    '''
+    value = np.zeros(len(psi), dtype=np.uint8)
+    basis = np.zeros(len(psi), dtype=np.uint8)
+    for i, qubit in enumerate(psi):
+        gates = _gate_names(qubit)
+        j = 0
+        while j < len(gates):
+            gate = gates[j]
+            if gates[j:j + 3] == ['s', 'sx', 's']:
+                gate = 'h'
+                j += 2
+            if gate == 'h':
+                basis[i] ^= 1
+            elif (gate == 'x' and basis[i] == 0) or (gate == 'z' and basis[i] == 1):
+                value[i] ^= 1
+            elif gate not in ('x', 'z'):
+                raise ValueError(f'Gate {gate!r} cannot be encoded.')
+            j += 1
+    return value, basis
+
+def encode_circuits(psi, noise='none', params=()):
+    return encode(*circuit_state(psi), noise=noise, params=params)
+
+
+#----------------------------------------
+# Decoding
+#----------------------------------------
+def decode(buffer):
+    '''
+    WireState of a message. The bitfields are views of buffer, nothing is
+    copied until they are unpacked.
+    '''
+    magic, version, flags, noise, rows, length, *params = HEADER.unpack_from(buffer)
+    if magic != MAGIC:
+        raise ValueError('Not a QZKP state message.')
+    if version != VERSION:
+        raise ValueError(f'Unsupported message version {version}.')
+    fields = 4 if flags & FRAME else 2
+    words = np.frombuffer(buffer, dtype='<u8', count=fields * rows * _words(length), offset=HEADER.size)
+    words = words.reshape(fields, rows, _words(length))
+    noise = _NOISE_CODES[noise]
+    return WireState(length, bool(flags & BATCH), noise, tuple(params[:len(NOISE[noise])]), words[0], words[1],
+                     words[2:] if flags & FRAME else None)
+
+def unpack(words, length):
+    '''
+    (rows, length) uint8 bits of (rows, words) packed words.
+    '''
+    return np.unpackbits(words.view(np.uint8), axis=-1, bitorder='little')[:, :length]
+
+def bitvector(words, length, row=0):
+    '''
+    BitVector sharing the words of one row.
+    '''
+    return BitVector.from_words(words[row], length)
+
+def state_bits(state):
+    '''
+    (value, basis) bit arrays of a WireState, with the Pauli frame applied:
+    X flips Z basis values and Z flips X basis values.
+    '''
+    value = unpack(state.value, state.key_length)
+    basis = unpack(state.basis, state.key_length)
+    if state.frame is not None:
+        frame_x, frame_z = (unpack(part, state.key_length) for part in state.frame)
+        value = value ^ (frame_x & (basis ^ 1)) ^ (frame_z & basis)
+    if not state.batched:
+        return value[0], basis[0]
+    return value, basis
+
+def to_qubits(state, rng=None):
+    '''
+    QubitArray of a WireState, carrying the flip noise of the header.
+    '''
+    value, basis = state_bits(state)
+    pbit, pphase = state.params if state.noise == 'flip' else (0.0, 0.0)
+    return QubitArray(value, basis, pbit, pphase, rng)
+
+def to_circuits(state):
+    '''
+    QuantumCircuit(1, 1) per qubit of a single state WireState.
+    '''
+    from qiskit import QuantumCircuit
+
+    psi = []
+    for bit, basis in zip(*state_bits(state)):
+        qubit = QuantumCircuit(1, 1)
+        if bit:
+            qubit.x(0)
+        if basis:
+            qubit.h(0)
+        psi.append(qubit)
+    return psi
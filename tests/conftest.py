@@ -0,0 +1,44 @@
+import math
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+
+def _match_rates(engine, rounds=50, key_length=64, seed=0):
+    '''
+    Fraction of challenge bits Bob recovers from honest proofs and from
+    intercept-resend attacks over rounds rounds with fixed keys.
+    '''
+    from qzkp.bitvec import BitVector
+    from qzkp.protocol import run_attack_round
+    from qzkp.randomness import RandomSource
+    from qzkp.verifier import count_matches
+
+    rand = RandomSource('numpy', seed=seed)
+    a, b = BitVector(rand.bits(key_length)), BitVector(rand.bits(key_length))
+    honest = attack = 0
+    for _ in range(rounds):
+        c = BitVector(rand.bits(key_length))
+        psi = engine.noise(engine.challenge_gen(engine.psi_gen(a, b), c, b), 'prepare', 'to_prover')
+        proof = engine.noise(engine.alice_mod(psi, a, b), 'prover', 'to_verifier')
+        honest += count_matches(c, b ^ BitVector(engine.measurements(proof, a)))
+        attack += round(run_attack_round(engine, rand, a, b) * key_length / 100)
+    bits = rounds * key_length
+    return honest / bits, attack / bits, bits
+
+def _agree(p, q, bits, z=4.0):
+    '''
+    Two match rates over bits bits each are within z standard errors.
+    '''
+    pooled = (p + q) / 2
+    return abs(p - q) <= z * math.sqrt(max(pooled * (1 - pooled), 1 / bits) * 2 / bits)
+
+@pytest.fixture
+def match_rates():
+    return _match_rates
+
+@pytest.fixture
+def agree():
+    return _agree
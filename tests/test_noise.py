@@ -0,0 +1,26 @@
+import pytest
+
+pytest.importorskip('qiskit_aer')
+import numpy as np
+from qiskit_aer import AerSimulator
+from qzkp.noise import PauliInjector, flip_noise_model, noiseless_h
+from qzkp.protocol import CircuitProtocol
+
+NOISE = [(0.05, 0.0), (0.0, 0.05), (0.05, 0.02)]
+
+
+@pytest.mark.parametrize('pbit, pphase', NOISE)
+def test_native_noise_matches_injection(pbit, pphase, match_rates, agree):
+    injected = CircuitProtocol(AerSimulator(), batch_size=64, transpiled=True,
+                               inject=PauliInjector(pbit, pphase, np.random.default_rng(1)))
+    # Native noise circuits are not transpiled, as in QZKP_noise_flip.py.
+    native = CircuitProtocol(AerSimulator(noise_model=flip_noise_model(pbit, pphase)), batch_size=64, prep_h=noiseless_h)
+    injected_honest, injected_attack, bits = match_rates(injected)
+    native_honest, native_attack, _ = match_rates(native)
+    assert agree(injected_honest, native_honest, bits)
+    assert agree(injected_attack, native_attack, bits)
+
+@pytest.mark.parametrize('pbit, pphase', NOISE)
+def test_noise_lowers_honest_match_rate(pbit, pphase, match_rates):
+    native = CircuitProtocol(AerSimulator(noise_model=flip_noise_model(pbit, pphase)), batch_size=64, prep_h=noiseless_h)
+    assert match_rates(native)[0] < 1.0
@@ -0,0 +1,57 @@
+import pytest
+
+pytest.importorskip('qiskit_aer')
+import numpy as np
+from qiskit_aer import AerSimulator
+from qzkp.bitvec import BitVector
+from qzkp.protocol import CircuitProtocol, run_attack_round
+from qzkp.randomness import RandomSource
+from qzkp.seeding import SEED_BLOCK, reseed
+
+# Spans more than one seed block.
+KEY_LENGTH = SEED_BLOCK + 40
+
+
+def measured(batch_size, seed=5, wide=False):
+    engine = CircuitProtocol(AerSimulator(), batch_size=batch_size, wide=wide)
+    engine.reseed(np.random.SeedSequence(seed))
+    # Prepared in Z and measured in X, every outcome is a coin flip.
+    psi = engine.psi_gen([i % 2 for i in range(KEY_LENGTH)], [0] * KEY_LENGTH)
+    return engine.measurements(psi, [1] * KEY_LENGTH)
+
+def attack_rounds(batch_size, rounds=4, seed=5):
+    engine = CircuitProtocol(AerSimulator(), batch_size=batch_size)
+    rand = RandomSource('numpy')
+    rounds_seed = np.random.SeedSequence(seed)
+    a, b = (BitVector(key) for key in np.random.default_rng(seed).integers(0, 2, size=(2, KEY_LENGTH)))
+    percentages = []
+    for i in range(rounds):
+        reseed(rounds_seed, i, rand, engine)
+        percentages.append(run_attack_round(engine, rand, a, b))
+    return percentages
+
+
+def test_measurements_are_random():
+    assert 0 < sum(measured(0)) < KEY_LENGTH
+
+@pytest.mark.parametrize('batch_size', [7, KEY_LENGTH])
+def test_measurements_do_not_depend_on_batch_size(batch_size):
+    assert measured(batch_size) == measured(0)
+
+@pytest.mark.parametrize('batch_size', [7, KEY_LENGTH])
+def test_rounds_do_not_depend_on_batch_size(batch_size):
+    assert attack_rounds(batch_size) == attack_rounds(0)
+
+@pytest.mark.parametrize('batch_size', [7, KEY_LENGTH])
+def test_wide_measurements_do_not_depend_on_batch_size(batch_size):
+    assert measured(batch_size, wide=True) == measured(0, wide=True)
+
+@pytest.mark.parametrize('batch_size', [7, 64])
+def test_unseeded_batches_match_per_qubit_jobs(match_rates, agree, batch_size):
+    honest, attack, bits = match_rates(CircuitProtocol(AerSimulator()), rounds=20)
+    batched_honest, batched_attack, _ = match_rates(CircuitProtocol(AerSimulator(), batch_size=batch_size), rounds=20)
+    assert honest == batched_honest == 1.0
+    assert agree(attack, batched_attack, bits)
+
+def test_seed_changes_measurements():
+    assert measured(0, seed=5) != measured(0, seed=6)
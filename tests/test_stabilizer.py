@@ -0,0 +1,23 @@
+import pytest
+
+pytest.importorskip('qiskit_aer')
+import numpy as np
+from qiskit_aer import AerSimulator
+from qzkp.noise import PauliInjector
+from qzkp.protocol import CircuitProtocol
+from qzkp.stabilizer import StabilizerBackend
+
+NOISE = [(0.0, 0.0), (0.05, 0.0), (0.0, 0.05), (0.05, 0.02)]
+
+
+@pytest.mark.parametrize('pbit, pphase', NOISE)
+def test_match_rates_agree_with_aer(pbit, pphase, match_rates, agree):
+    aer = CircuitProtocol(AerSimulator(), batch_size=64, transpiled=True,
+                          inject=PauliInjector(pbit, pphase, np.random.default_rng(1)))
+    aer_honest, aer_attack, bits = match_rates(aer)
+    numpy_honest, numpy_attack, _ = match_rates(StabilizerBackend(pbit, pphase, seed=2))
+    assert agree(aer_honest, numpy_honest, bits)
+    assert agree(aer_attack, numpy_attack, bits)
+
+def test_noiseless_honest_rounds_recover_every_bit(match_rates):
+    assert match_rates(StabilizerBackend(seed=0))[0] == 1.0